@@ -7,4 +7,12 @@ python manage.py collectstatic --noinput
 # Set SKIP_MIGRATIONS=1 on Netlify when DB is external/unavailable at build time.
 if [ "${SKIP_MIGRATIONS:-1}" != "1" ]; then
   python manage.py migrate --noinput
+  python manage.py createcachetable
+  python manage.py backfill_order_items
+  python manage.py backfill_renditions
+  python manage.py rebuild_catalog_read_model
+  python manage.py recompute_products_summary
+  python manage.py backfill_contact_domains
+  python manage.py repair_dashboard_metrics
+  python manage.py rollup_orders
 fi
@@ -63,7 +63,6 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
-                "ecommerceapp.context_processors.admin_dashboard_context",
             ],
         },
     },
@@ -90,6 +89,24 @@ try:
 except ImportError:
     pass
 
+# CACHE – shared by all gunicorn workers so catalog invalidation reaches
+# every process. Run `python manage.py createcachetable` after migrating.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "django_cache"),
+    }
+}
+
+# Part of every catalog ETag so a deploy with new templates is refetched.
+RELEASE_ID = os.getenv("RENDER_GIT_COMMIT", "")
+
+# Homepage search: "auto" uses SQLite FTS5 / PostgreSQL tsvector,
+# "icontains" falls back to the plain substring search.
+CATALOG_SEARCH_BACKEND = os.getenv("CATALOG_SEARCH_BACKEND", "auto").strip().lower()
+
 # Internationalization
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "Asia/Kolkata"
@@ -104,7 +121,17 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 # Media (Cloudinary)
 MEDIA_URL = "/media/"
-DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
+MEDIA_ROOT = BASE_DIR / "media"
+# Uploads go to Cloudinary. MEDIA_STORAGE=local keeps them in MEDIA_ROOT
+# instead, for offline development and benchmarks only: the filesystem on
+# Render is wiped on every deploy.
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "cloudinary").strip().lower()
+if MEDIA_STORAGE == "local":
+    DEFAULT_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+else:
+    DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
+# Resolved media URLs kept per process (see ecommerceapp.media).
+MEDIA_URL_CACHE_SIZE = int(os.getenv("MEDIA_URL_CACHE_SIZE", "4096"))
 
 CLOUDINARY_STORAGE = {
     "CLOUD_NAME": os.getenv("CLOUDINARY_CLOUD_NAME"),
@@ -160,6 +187,17 @@ if os.getenv("USE_CONSOLE_EMAIL", "false").strip().lower() == "true":
 # Razorpay
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "")
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET", "")
+
+# Payment gateway client (see ecommerceapp.payments). "fake" never calls
+# Razorpay and is meant for tests and benchmarks. Timeouts are seconds;
+# the circuit opens after PAYMENT_BREAKER_THRESHOLD straight failures and
+# retries after PAYMENT_BREAKER_RESET_TIMEOUT.
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "razorpay").strip().lower()
+PAYMENT_CONNECT_TIMEOUT = float(os.getenv("PAYMENT_CONNECT_TIMEOUT", "3.05"))
+PAYMENT_READ_TIMEOUT = float(os.getenv("PAYMENT_READ_TIMEOUT", "10"))
+PAYMENT_BREAKER_THRESHOLD = int(os.getenv("PAYMENT_BREAKER_THRESHOLD", "5"))
+PAYMENT_BREAKER_RESET_TIMEOUT = float(os.getenv("PAYMENT_BREAKER_RESET_TIMEOUT", "30"))
 
 # ========== LOGGING FOR DEBUGGING 500 ERRORS ==========
 LOGGING = {
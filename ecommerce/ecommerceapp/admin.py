@@ -2,30 +2,67 @@ import csv
 import io
 
 from django.contrib import admin, messages
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import path, reverse
 
-from ecommerceapp.models import Contact, Product, Orders, OrderUpdate, CarouselAd, ShopCategory
+from ecommerceapp.models import (
+    CarouselAd,
+    Contact,
+    DailyOrderStats,
+    DailyStateOrderStats,
+    OrderItem,
+    OrderUpdate,
+    Orders,
+    PaymentEvent,
+    Product,
+    ShopCategory,
+    refresh_orders_status,
+)
+from ecommerceapp.orderitems import create_order_items
 
 admin.site.site_header = "NATURAL NIKHAAR Admin"
 admin.site.site_title = "NATURAL NIKHAAR Admin Portal"
 admin.site.index_title = "Welcome to NATURAL NIKHAAR Admin Portal"
 
 
+# Rows fetched per round trip; with PostgreSQL this is a server-side cursor.
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """A file-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
 def export_queryset_to_csv(queryset, field_names, filename):
-    response = HttpResponse(content_type="text/csv")
+    """Stream ``field_names`` of ``queryset`` as a CSV download.
+
+    Only the exported columns are selected and rows are read in chunks as
+    the response is sent, so memory stays flat at any table size and the
+    header goes out before the first row is fetched.
+    """
+    writer = csv.writer(Echo())
+    rows = queryset.prefetch_related(None).values_list(*field_names).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def stream():
+        yield writer.writerow(field_names)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type="text/csv")
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    writer = csv.writer(response)
-    writer.writerow(field_names)
-    for obj in queryset:
-        writer.writerow([getattr(obj, field, "") for field in field_names])
     return response
 
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "email", "phonenumber")
+    list_display = ("id", "name", "email", "email_domain", "phonenumber")
+    list_filter = ("email_domain",)
     search_fields = ("name", "email", "phonenumber")
     change_list_template = "admin/ecommerceapp/contact/change_list.html"
     actions = ("export_selected_to_csv",)
@@ -117,13 +154,30 @@ class ContactAdmin(admin.ModelAdmin):
         return render(request, "admin/csv_import.html", context)
 
 
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    fields = ("product", "product_name", "quantity", "unit_price")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+class OrderUpdateInline(admin.TabularInline):
+    model = OrderUpdate
+    fields = ("update_desc", "delivered", "cancelled", "timestamp")
+    readonly_fields = ("timestamp",)
+    ordering = ("update_id",)
+    extra = 0
+
+
 @admin.register(Orders)
 class OrdersAdmin(admin.ModelAdmin):
-    list_display = ("order_id", "name", "products_summary", "email", "city", "state", "amount", "paymentstatus", "order_timestamp")
+    list_display = ("order_id", "name", "products", "email", "city", "state", "amount", "paymentstatus", "latest_update", "order_timestamp")
     list_filter = ("state", "paymentstatus", "city")
-    search_fields = ("order_id", "name", "email", "phone", "oid")
+    search_fields = ("order_id", "name", "email", "phone", "oid", "products_summary")
     change_list_template = "admin/ecommerceapp/orders/change_list.html"
-    actions = ("export_selected_to_csv",)
+    actions = ("export_selected_to_csv", "mark_shipped", "mark_delivered", "mark_cancelled")
+    inlines = (OrderItemInline, OrderUpdateInline)
 
     csv_fields = (
         "order_id",
@@ -157,10 +211,29 @@ class OrdersAdmin(admin.ModelAdmin):
         "phone",
     )
 
-    @admin.display(description="Products")
-    def products_summary(self, obj):
+    @admin.display(description="Products", ordering="products_summary")
+    def products(self, obj):
+        # Stored column: no JSON parsing while listing orders, except for
+        # rows recompute_products_summary has not filled yet.
         return obj.get_products_summary()
 
+    def get_queryset(self, request):
+        # One extra query loads the timelines for the whole changelist page.
+        return super().get_queryset(request).prefetch_related(
+            Prefetch("updates", queryset=OrderUpdate.objects.order_by("update_id"))
+        )
+
+    @admin.display(description="Latest update")
+    def latest_update(self, obj):
+        updates = obj.updates.all()
+        return updates[len(updates) - 1].update_desc if updates else "-"
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "items_json" in form.changed_data:
+            obj.items.all().delete()
+            create_order_items(obj, obj.items_json)
+
     @admin.display(description="Timestamp", ordering="created_at")
     def order_timestamp(self, obj):
         return obj.created_at
@@ -191,6 +264,44 @@ class OrdersAdmin(admin.ModelAdmin):
     def export_selected_to_csv(self, request, queryset):
         return export_queryset_to_csv(queryset, self.csv_fields, "orders_selected.csv")
 
+    def add_status_updates(self, request, queryset, update_desc, **flags):
+        """Append one update to each selected order and refresh their status.
+
+        Orders that are already cancelled, or already delivered when marking
+        delivered or shipped, are skipped. The rows go in with bulk_create and
+        the status is recomputed for the whole selection with one UPDATE, so
+        the query count does not grow with the selection.
+        """
+        eligible = queryset.filter(cancelled_at__isnull=True)
+        if not flags.get("cancelled"):
+            eligible = eligible.filter(delivered_at__isnull=True)
+        order_ids = list(eligible.values_list("order_id", flat=True))
+        with transaction.atomic():
+            OrderUpdate.objects.bulk_create(
+                [OrderUpdate(order_id=order_id, update_desc=update_desc, **flags) for order_id in order_ids],
+                batch_size=500,
+            )
+            if flags:
+                refresh_orders_status(Orders.objects.filter(order_id__in=order_ids))
+        skipped = queryset.count() - len(order_ids)
+        self.message_user(
+            request,
+            f"{update_desc}: {len(order_ids)} orders updated, {skipped} skipped.",
+            level=messages.SUCCESS,
+        )
+
+    @admin.action(description="Mark selected orders shipped")
+    def mark_shipped(self, request, queryset):
+        self.add_status_updates(request, queryset, "Order shipped")
+
+    @admin.action(description="Mark selected orders delivered")
+    def mark_delivered(self, request, queryset):
+        self.add_status_updates(request, queryset, "Order delivered", delivered=True)
+
+    @admin.action(description="Mark selected orders cancelled")
+    def mark_cancelled(self, request, queryset):
+        self.add_status_updates(request, queryset, "Order cancelled", cancelled=True)
+
     def export_csv_view(self, request):
         queryset = Orders.objects.all().order_by("-order_id")
         return export_queryset_to_csv(queryset, self.csv_fields, "orders_all.csv")
@@ -222,21 +333,24 @@ class OrdersAdmin(admin.ModelAdmin):
             skipped = 0
             for row in reader:
                 try:
-                    Orders.objects.create(
-                        items_json=(row.get("items_json") or "").strip(),
-                        amount=int((row.get("amount") or "0").strip() or 0),
-                        name=(row.get("name") or "").strip(),
-                        email=(row.get("email") or "").strip(),
-                        address1=(row.get("address1") or "").strip(),
-                        address2=(row.get("address2") or "").strip(),
-                        city=(row.get("city") or "").strip(),
-                        state=(row.get("state") or "").strip(),
-                        zip_code=(row.get("zip_code") or "").strip(),
-                        oid=(row.get("oid") or "").strip(),
-                        amountpaid=(row.get("amountpaid") or "").strip(),
-                        paymentstatus=(row.get("paymentstatus") or "").strip(),
-                        phone=(row.get("phone") or "").strip(),
-                    )
+                    with transaction.atomic():
+                        items_json = (row.get("items_json") or "").strip()
+                        order = Orders.objects.create(
+                            items_json=items_json,
+                            amount=int((row.get("amount") or "0").strip() or 0),
+                            name=(row.get("name") or "").strip(),
+                            email=(row.get("email") or "").strip(),
+                            address1=(row.get("address1") or "").strip(),
+                            address2=(row.get("address2") or "").strip(),
+                            city=(row.get("city") or "").strip(),
+                            state=(row.get("state") or "").strip(),
+                            zip_code=(row.get("zip_code") or "").strip(),
+                            oid=(row.get("oid") or "").strip(),
+                            amountpaid=(row.get("amountpaid") or "").strip(),
+                            paymentstatus=(row.get("paymentstatus") or "").strip(),
+                            phone=(row.get("phone") or "").strip(),
+                        )
+                        create_order_items(order, items_json)
                     created += 1
                 except Exception:
                     skipped += 1
@@ -261,32 +375,47 @@ class OrdersAdmin(admin.ModelAdmin):
 admin.site.register(Product)
 
 
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ("key", "source", "event", "razorpay_order_id", "outcome", "attempts", "received_at", "processed_at")
+    list_filter = ("source", "event", "outcome")
+    search_fields = ("key", "razorpay_order_id", "razorpay_payment_id")
+    readonly_fields = [field.name for field in PaymentEvent._meta.fields]
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Read-only views of the rollups; date_hierarchy gives fast day-range filters."""
+
+    date_hierarchy = "day"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyOrderStats)
+class DailyOrderStatsAdmin(RollupAdmin):
+    list_display = ("day", "orders", "revenue", "paid_orders", "paid_revenue", "pending_orders")
+
+
+@admin.register(DailyStateOrderStats)
+class DailyStateOrderStatsAdmin(RollupAdmin):
+    list_display = ("day", "state", "orders", "revenue")
+    list_filter = ("state",)
+
+
 @admin.register(OrderUpdate)
 class OrderUpdateAdmin(admin.ModelAdmin):
     list_display = ("update_id", "order_id", "update_desc", "delivered", "cancelled", "timestamp")
     list_filter = ("delivered", "cancelled", "timestamp")
     search_fields = ("order_id", "update_desc")
     list_editable = ("delivered", "cancelled")
-
-    def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
-        order = Orders.objects.filter(order_id=obj.order_id).first()
-        if not order:
-            return
-        updates = OrderUpdate.objects.filter(order_id=obj.order_id)
-        if updates.filter(cancelled=True).exists():
-            new_status = "Cancelled"
-        elif updates.filter(delivered=True).exists():
-            new_status = "Delivered"
-        elif order.paymentstatus in ("Delivered", "Cancelled"):
-            # If delivery/cancel flags are removed, fall back to paid/pending state.
-            new_status = "Paid" if order.amountpaid else "Pending"
-        else:
-            new_status = order.paymentstatus
-
-        if new_status != order.paymentstatus:
-            order.paymentstatus = new_status
-            order.save(update_fields=["paymentstatus"])
+    raw_id_fields = ("order",)
 
 
 @admin.register(CarouselAd)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EcommerceappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecommerceapp'
+
+    def ready(self):
+        from ecommerceapp import signals  # noqa: F401
@@ -0,0 +1,304 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.text import slugify
+
+from ecommerceapp.models import CarouselAd, CatalogCategory, CatalogEntry, ShopCategory
+from ecommerceapp.search import search_products
+
+
+PRODUCTS_PER_SLIDE = 4
+CATALOG_PAGE_SIZE = 12
+CATALOG_PAGE_SIZE_MAX = 48
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_MODIFIED_KEY = "catalog:modified"
+CATALOG_CACHE_TIMEOUT = 60 * 60
+# How long a worker may hold the rebuild lock, and how long the others wait
+# for it before rendering on their own.
+CATALOG_LOCK_TIMEOUT = 30
+CATALOG_LOCK_WAIT = 5
+CATALOG_LOCK_POLL = 0.05
+# Longer homepage search queries are cut to this length.
+SEARCH_QUERY_MAX_LENGTH = 100
+
+
+def group_products_by_category(products, per_slide=PRODUCTS_PER_SLIDE, totals=None):
+    """Group an iterable of products into homepage category sections.
+
+    The products are read exactly once (a single query when a queryset is
+    passed), so the number of queries does not depend on how many
+    categories exist. Sections keep the order in which their first product
+    appears, and products keep their incoming order within a section.
+
+    ``totals`` maps a category to its full product count when only the
+    first products of each category were passed in; such sections get a
+    ``next_url`` pointing at the paginated category API.
+
+    Returns ``(allProds, category_anchor_map)`` where every ``allProds``
+    entry has the ``[products, range(1, nSlides + 1), nSlides, next_url]``
+    shape the homepage template expects.
+    """
+    sections = {}
+    for product in products:
+        sections.setdefault(product.category, []).append(product)
+
+    allProds = []
+    category_anchor_map = {}
+    for category, items in sections.items():
+        # Read-model entries carry their slug; plain products compute it.
+        slug = getattr(items[0], "category_slug", None) or slugify(category)
+        n = len(items)
+        if totals is not None:
+            n = max(n, totals.get(category, n))
+        nSlides = n // per_slide + (1 if n % per_slide != 0 else 0)
+        next_url = None
+        if n > len(items):
+            next_url = catalog_section_url(slug, items[-1].id)
+        allProds.append([items, range(1, nSlides + 1), nSlides, next_url])
+        category_anchor_map[slug] = f"category-{slug}"
+
+    return allProds, category_anchor_map
+
+
+def first_products_per_category(per_slide=PRODUCTS_PER_SLIDE):
+    """Return the first slide of every category plus per-category totals.
+
+    A single windowed query over the catalog read model, so the homepage
+    cost stays flat however many products each category holds.
+    """
+    products = list(
+        CatalogEntry.objects.annotate(
+            category_position=Window(
+                RowNumber(), partition_by=[F("category")], order_by=F("pk").asc()
+            ),
+            category_total=Window(Count("pk"), partition_by=[F("category")]),
+        )
+        .filter(category_position__lte=per_slide)
+        .order_by("pk")
+    )
+    totals = {product.category: product.category_total for product in products}
+    return products, totals
+
+
+# ==============================
+# Catalog version
+# ==============================
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never reuses a
+        # number that older cache entries were stored under.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns() // 1000, None)
+        cache.add(CATALOG_MODIFIED_KEY, time.time(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        version = cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = time.time_ns() // 1000
+        cache.set(CATALOG_VERSION_KEY, version, None)
+    cache.set(CATALOG_MODIFIED_KEY, time.time(), None)
+    return version
+
+
+def get_catalog_last_modified():
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        modified = time.time()
+        cache.add(CATALOG_MODIFIED_KEY, modified, None)
+    return datetime.fromtimestamp(int(modified), tz=dt_timezone.utc)
+
+
+def catalog_etag(*parts, version=None):
+    """ETag for a catalog-derived response; changes with every catalog write."""
+    if version is None:
+        version = get_catalog_version()
+    key = ":".join(str(part) for part in (settings.RELEASE_ID, version) + parts)
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+# ==============================
+# Rendered homepage sections
+# ==============================
+def build_catalog_sections(query=""):
+    if query:
+        # Ranked ids from the search index; sections follow their best match.
+        ranked_ids = search_products(query)
+        found = CatalogEntry.objects.in_bulk(ranked_ids)
+        products = [found[pk] for pk in ranked_ids if pk in found]
+        totals = None
+    else:
+        products, totals = first_products_per_category()
+
+    allProds, category_anchor_map = group_products_by_category(products, totals=totals)
+
+    shop_categories = (
+        ShopCategory.objects.filter(is_active=True)
+        .exclude(image="")
+        .exclude(image__isnull=True)
+    )
+
+    shop_category_cards = []
+    for item in shop_categories:
+        section_slug = slugify(item.section_name)
+        section_anchor = category_anchor_map.get(section_slug)
+        if section_anchor:
+            href = f"#{section_anchor}"
+        else:
+            href = f"/?query={item.section_name}"
+        shop_category_cards.append(
+            {
+                "name": item.section_name,
+                "image": item.image,
+                "href": href,
+            }
+        )
+
+    ads = (
+        CarouselAd.objects.filter(is_active=True)
+        .exclude(image="")
+        .exclude(image__isnull=True)
+    )
+
+    context = {
+        "allProds": allProds,
+        "query": query,
+        "ads": ads,
+        "shop_categories": shop_category_cards,
+    }
+    return {
+        "ads": render_to_string("catalog/ads.html", context),
+        "shop_categories": render_to_string("catalog/shop_categories.html", context),
+        "category_options": render_to_string("catalog/category_options.html", context),
+        "product_sections": render_to_string("catalog/product_sections.html", context),
+    }
+
+
+def normalize_query(value):
+    """The homepage search query: whitespace collapsed, at most SEARCH_QUERY_MAX_LENGTH chars."""
+    return " ".join((value or "").split())[:SEARCH_QUERY_MAX_LENGTH].strip()
+
+
+def get_catalog_sections(query=""):
+    """Return the rendered homepage sections, cached per catalog version.
+
+    Only the no-query page is cached: search results are rendered per
+    request so arbitrary query strings cannot fill the shared cache. Only
+    one worker rebuilds a missing entry; the others wait briefly for its
+    result instead of all rendering the catalog at once.
+    """
+    if query:
+        return build_catalog_sections(query)
+
+    key = f"catalog:v{get_catalog_version()}:sections"
+    sections = cache.get(key)
+    if sections is not None:
+        return sections
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, CATALOG_LOCK_TIMEOUT):
+        try:
+            sections = build_catalog_sections(query)
+            cache.set(key, sections, CATALOG_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return sections
+
+    deadline = time.monotonic() + CATALOG_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(CATALOG_LOCK_POLL)
+        sections = cache.get(key)
+        if sections is not None:
+            return sections
+
+    # The lock holder is slow or gone; serve a fresh render without caching.
+    return build_catalog_sections()
+
+
+# ==============================
+# Paginated category API
+# ==============================
+def catalog_section_url(category_slug, after, limit=None):
+    url = f"{reverse('catalog_section', args=[category_slug])}?after={after}"
+    if limit:
+        url += f"&limit={limit}"
+    return url
+
+
+def get_category_slug_map():
+    """Map every category slug to the raw category names that produce it."""
+    key = f"catalog:v{get_catalog_version()}:category-slugs"
+    mapping = cache.get(key)
+    if mapping is None:
+        mapping = {}
+        for slug, name in CatalogCategory.objects.values_list("slug", "name"):
+            mapping.setdefault(slug, []).append(name)
+        cache.set(key, mapping, CATALOG_CACHE_TIMEOUT)
+    return mapping
+
+
+def product_payload(entry):
+    return {
+        "id": entry.id,
+        "product_name": entry.product_name,
+        "category": entry.category,
+        "subcategory": entry.subcategory,
+        "desc": entry.desc,
+        "mrp": entry.mrp,
+        "selling_price": entry.selling_price,
+        "offer_percentage": entry.offer_percentage,
+        "images": entry.image_urls,
+    }
+
+
+def get_catalog_page(category_slug, after=0, limit=CATALOG_PAGE_SIZE):
+    """Return one keyset page of a category section, or None if unknown.
+
+    Pages are ordered by product id and continue after ``after``; the
+    response carries the rendered cards so the homepage can append them
+    with the same markup it renders server-side.
+    """
+    names = get_category_slug_map().get(category_slug)
+    if not names:
+        return None
+
+    # Only cursors the server hands out are cached: the start of a section
+    # or the id of one of its products, at the default page size. Anything
+    # else a client sends is served uncached, so it cannot fill the cache.
+    cacheable = limit == CATALOG_PAGE_SIZE
+    key = f"catalog:v{get_catalog_version()}:page:{category_slug}:{after}"
+    if cacheable:
+        page = cache.get(key)
+        if page is not None:
+            return page
+
+    products = list(
+        CatalogEntry.objects.filter(category_slug=category_slug, pk__gte=after).order_by("pk")[:limit + 2]
+    )
+    issued = after == 0
+    if products and products[0].pk == after:
+        products = products[1:]
+        issued = True
+    has_more = len(products) > limit
+    products = products[:limit]
+    page = {
+        "category": names[0],
+        "slug": category_slug,
+        "results": [product_payload(product) for product in products],
+        "html": render_to_string("catalog/product_cards.html", {"products": products}),
+        "next": catalog_section_url(category_slug, products[-1].id, limit) if has_more else None,
+    }
+    if cacheable and issued:
+        cache.set(key, page, CATALOG_CACHE_TIMEOUT)
+    return page
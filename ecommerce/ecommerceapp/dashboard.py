@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from ecommerceapp import metrics, rollups
+from ecommerceapp.models import Contact
+from ecommerceapp.orderitems import sales_by_product
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_PREFIX = "admin:dashboard"
+# A section is served as-is for its fresh_for seconds. After that the next
+# reader still gets the cached numbers while one worker recomputes them in
+# the background; entries older than DASHBOARD_CACHE_TIMEOUT are dropped.
+DASHBOARD_CACHE_TIMEOUT = 15 * 60
+DASHBOARD_LOCK_TIMEOUT = 30
+DASHBOARD_LOCK_WAIT = 5
+DASHBOARD_LOCK_POLL = 0.05
+# Default and maximum day range of the time-series charts.
+DASHBOARD_DAYS = 90
+DASHBOARD_MAX_DAYS = 366
+
+
+def _series(pairs):
+    pairs = list(pairs)
+    return {"labels": [label for label, _ in pairs], "values": [value for _, value in pairs]}
+
+
+def _kpis(days):
+    counters = metrics.dashboard()
+    return {
+        "total_orders": counters["total_orders"],
+        "total_revenue": counters["total_revenue"],
+        "total_products": counters["total_products"],
+        "total_contacts": counters["total_contacts"],
+        "active_ads": counters["active_ads"],
+    }
+
+
+def _daily(field):
+    def compute(days):
+        today = timezone.localdate()
+        rows = rollups.daily_series(today - timedelta(days=days - 1), today)
+        return _series((row["day"].isoformat(), row[field]) for row in rows)
+
+    return compute
+
+
+def _counter_chart(name):
+    def compute(days):
+        return _series(metrics.dashboard()[name])
+
+    return compute
+
+
+def _contact_domains(days):
+    return _series(
+        Contact.objects.exclude(email_domain="")
+        .values_list("email_domain")
+        .annotate(total=Count("id"))
+        .order_by("-total", "email_domain")[:7]
+    )
+
+
+def _top_products(days):
+    return _series((row["product__product_name"], row["units"]) for row in sales_by_product()[:7])
+
+
+Section = namedtuple("Section", "compute fresh_for time_series")
+
+# Each section is cached, refreshed and served on its own, so one slow
+# chart never holds up the others.
+SECTIONS = {
+    "kpis": Section(_kpis, 60, False),
+    "orders": Section(_daily("orders"), 5 * 60, True),
+    "revenue": Section(_daily("revenue"), 5 * 60, True),
+    "payment": Section(_counter_chart("payment"), 60, False),
+    "state": Section(_counter_chart("state"), 5 * 60, False),
+    "category": Section(_counter_chart("category"), 5 * 60, False),
+    "contact_domains": Section(_contact_domains, 5 * 60, False),
+    "top_products": Section(_top_products, 5 * 60, False),
+}
+
+
+def clamp_days(value):
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return DASHBOARD_DAYS
+    return max(1, min(days, DASHBOARD_MAX_DAYS))
+
+
+def compute(name, days=DASHBOARD_DAYS):
+    """Build one dashboard section from the counters, rollups, order items or contacts.
+
+    Read-only: the rollups are written by the rollup_orders command.
+    """
+    data = SECTIONS[name].compute(days)
+    data["computed_at"] = timezone.now().isoformat()
+    return data
+
+
+def _cache_key(name, days):
+    if SECTIONS[name].time_series:
+        return f"{DASHBOARD_CACHE_PREFIX}:{name}:{days}d"
+    return f"{DASHBOARD_CACHE_PREFIX}:{name}"
+
+
+def _refresh(name, days):
+    key = _cache_key(name, days)
+    try:
+        data = compute(name, days)
+        cache.set(key, {"data": data, "fresh_until": time.time() + SECTIONS[name].fresh_for}, DASHBOARD_CACHE_TIMEOUT)
+        return data
+    finally:
+        cache.delete(f"{key}:lock")
+
+
+def _in_background(func):
+    def run():
+        close_old_connections()
+        try:
+            func()
+        except Exception:
+            logger.exception("dashboard refresh failed")
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=run, name="dashboard-refresh", daemon=True).start()
+
+
+def get_section(name, days=DASHBOARD_DAYS):
+    """One dashboard section, shared by every worker through the cache.
+
+    At most one worker recomputes a section at a time. A stale entry is
+    served while the lock holder refreshes it in the background; only a
+    missing entry makes readers wait for the computation.
+    """
+    days = clamp_days(days)
+    key = _cache_key(name, days)
+    lock_key = f"{key}:lock"
+    entry = cache.get(key)
+    if entry is not None:
+        if entry["fresh_until"] <= time.time() and cache.add(lock_key, 1, DASHBOARD_LOCK_TIMEOUT):
+            _in_background(lambda: _refresh(name, days))
+        return entry["data"]
+
+    if cache.add(lock_key, 1, DASHBOARD_LOCK_TIMEOUT):
+        return _refresh(name, days)
+
+    deadline = time.monotonic() + DASHBOARD_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(DASHBOARD_LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry["data"]
+
+    # The lock holder is slow or gone; compute without caching.
+    return compute(name, days)
@@ -0,0 +1,155 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from ecommerceapp.media import media_url
+from ecommerceapp.models import ProductImageRendition
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SLOTS = (1, 2, 3)
+RENDITION_WIDTHS = (320, 640, 960)
+# format name -> (Pillow format, save options)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def product_image(product, slot):
+    return getattr(product, f"image{slot}")
+
+
+def _target_widths(source_width):
+    widths = [width for width in RENDITION_WIDTHS if width < source_width]
+    # Small uploads still get one rendition at their own size.
+    if source_width <= RENDITION_WIDTHS[-1]:
+        widths.append(source_width)
+    return sorted(set(widths))
+
+
+def _encode(image, fmt):
+    pillow_format, options = RENDITION_FORMATS[fmt]
+    if pillow_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def build_renditions(product, slot):
+    """Resize one product image into every width and format.
+
+    Returns unsaved ``ProductImageRendition`` objects whose files are
+    already written to storage.
+    """
+    field = product_image(product, slot)
+    with field.open("rb") as handle:
+        source = Image.open(handle)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ("RGB", "RGBA", "L"):
+        source = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+    stem = os.path.splitext(os.path.basename(field.name))[0]
+    renditions = []
+    for width in _target_widths(source.width):
+        height = max(1, round(source.height * width / source.width))
+        resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+        for fmt in RENDITION_FORMATS:
+            rendition = ProductImageRendition(
+                product=product,
+                slot=slot,
+                source_name=field.name,
+                format=fmt,
+                width=width,
+                height=height,
+            )
+            rendition.file.save(f"{stem}_{width}w.{fmt}", ContentFile(_encode(resized, fmt)), save=False)
+            renditions.append(rendition)
+    return renditions
+
+
+def generate_renditions(product, force=False):
+    """Bring a product's renditions in line with its current images.
+
+    Slots whose image is unchanged are skipped unless ``force`` is set;
+    renditions of removed or replaced images are deleted. Returns the
+    number of renditions written.
+    """
+    existing = {}
+    for rendition in ProductImageRendition.objects.filter(product=product):
+        existing.setdefault(rendition.slot, []).append(rendition)
+
+    stale = []
+    fresh = []
+    for slot in IMAGE_SLOTS:
+        field = product_image(product, slot)
+        current = existing.get(slot, [])
+        if field and not force and current and all(r.source_name == field.name for r in current):
+            continue
+        stale += current
+        if field:
+            try:
+                fresh += build_renditions(product, slot)
+            except Exception:
+                logger.exception("could not build renditions for product %s image%s", product.pk, slot)
+
+    if not stale and not fresh:
+        return 0
+
+    with transaction.atomic():
+        ProductImageRendition.objects.filter(pk__in=[r.pk for r in stale]).delete()
+        ProductImageRendition.objects.bulk_create(fresh)
+    for rendition in stale:
+        rendition.file.delete(save=False)
+    return len(fresh)
+
+
+def renditions_for(product, slot):
+    """The product's renditions for ``slot``, grouped by format.
+
+    Reads ``product.renditions.all()`` so a ``prefetch_related("renditions")``
+    on the product query keeps this free of extra queries.
+    """
+    field = product_image(product, slot)
+    grouped = {}
+    for rendition in product.renditions.all():
+        if rendition.slot == slot and field and rendition.source_name == field.name:
+            grouped.setdefault(rendition.format, []).append(rendition)
+    for items in grouped.values():
+        items.sort(key=lambda r: r.width)
+    return grouped
+
+
+def _srcset(renditions):
+    return ", ".join(f"{media_url(r.file)} {r.width}w" for r in renditions)
+
+
+def picture_data(product, slot):
+    """Everything needed to render ``slot`` as a <picture>, or None.
+
+    ``src`` is the largest JPEG rendition (or the original upload when
+    there are none yet); ``sources`` lists ``[mime type, srcset]`` pairs
+    offered ahead of the JPEG ``srcset``.
+    """
+    field = product_image(product, slot)
+    if not field:
+        return None
+    grouped = renditions_for(product, slot)
+    fallback = grouped.get("jpeg")
+    if not fallback:
+        return {"src": media_url(field), "srcset": "", "width": None, "height": None, "sources": []}
+    largest = fallback[-1]
+    return {
+        "src": media_url(largest.file),
+        "srcset": _srcset(fallback),
+        "width": largest.width,
+        "height": largest.height,
+        "sources": [[MIME_TYPES[fmt], _srcset(items)] for fmt, items in grouped.items() if fmt != "jpeg"],
+    }
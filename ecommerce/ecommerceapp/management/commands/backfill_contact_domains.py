@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from ecommerceapp.models import Contact, email_domain_of
+
+
+class Command(BaseCommand):
+    help = "Fill the stored Contact.email_domain column from email."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--all", action="store_true", help="Also recompute rows that already have a domain.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        contacts = Contact.objects.only("id", "email", "email_domain").order_by("id")
+        if not options["all"]:
+            contacts = contacts.filter(email_domain="")
+
+        last_id = 0
+        scanned = 0
+        updated = 0
+        while True:
+            batch = list(contacts.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+            changed = []
+            for contact in batch:
+                domain = email_domain_of(contact.email)
+                if domain != contact.email_domain:
+                    contact.email_domain = domain
+                    changed.append(contact)
+            updated += Contact.objects.bulk_update(changed, ["email_domain"])
+
+        self.stdout.write(f"backfill_contact_domains: scanned {scanned} contacts, updated {updated}")
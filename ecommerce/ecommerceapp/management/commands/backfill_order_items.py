@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ecommerceapp.models import OrderItem, Orders
+from ecommerceapp.orderitems import build_order_items
+
+
+class Command(BaseCommand):
+    help = "Create OrderItem rows from items_json for orders that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pending = Orders.objects.filter(items__isnull=True).only("order_id", "items_json").order_by("order_id")
+
+        last_id = 0
+        orders_done = 0
+        items_written = 0
+        # Keyset batches: each one is a short query and its own transaction,
+        # so the table is never loaded at once or locked for long.
+        while True:
+            batch = list(pending.filter(order_id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].order_id
+            with transaction.atomic():
+                items = OrderItem.objects.bulk_create(
+                    build_order_items((order, order.items_json) for order in batch)
+                )
+            orders_done += len(batch)
+            items_written += len(items)
+            self.stdout.write(f"  up to order {last_id}: {items_written} items so far")
+
+        self.stdout.write(f"backfill_order_items: scanned {orders_done} orders, wrote {items_written} items")
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from ecommerceapp import readmodel
+from ecommerceapp.catalog import bump_catalog_version
+from ecommerceapp.images import generate_renditions
+from ecommerceapp.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate responsive image renditions for products whose images changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Check every product with images, not only pending ones.")
+        parser.add_argument("--force", action="store_true", help="Rebuild renditions that already exist (implies --all).")
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        products = (
+            Product.objects.exclude(
+                Q(image1__in=["", None]) & Q(image2__in=["", None]) & Q(image3__in=["", None])
+            )
+            .order_by("id")
+        )
+        if not (options["all"] or options["force"]):
+            products = products.filter(renditions_pending=True)
+
+        last_id = 0
+        total = 0
+        written = 0
+        refreshed = 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            # Clear the flag first: a save that lands while we encode sets it
+            # again and the product is picked up by the next run.
+            Product.objects.filter(pk__in=[product.pk for product in batch]).update(renditions_pending=False)
+            for product in batch:
+                count = generate_renditions(product, force=options["force"])
+                if count:
+                    readmodel.refresh_product(product.pk)
+                    refreshed += 1
+                written += count
+            total += len(batch)
+        if refreshed:
+            bump_catalog_version()
+        self.stdout.write(f"backfill_renditions: checked {total} products, wrote {written} renditions")
@@ -0,0 +1,55 @@
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from ecommerceapp.media import MediaURLCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare direct storage.url() calls with the memoized media URL "
+        "cache for a homepage-sized set of image names. Nothing is uploaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--names", type=int, default=300, help="Distinct image names per render.")
+        parser.add_argument("--repeat", type=int, default=50, help="Simulated homepage renders.")
+        parser.add_argument(
+            "--storage",
+            choices=("local", "cloudinary"),
+            default="local",
+            help="cloudinary builds real Cloudinary URLs offline with a placeholder cloud name.",
+        )
+
+    def handle(self, *args, **options):
+        storage = self.get_storage(options["storage"])
+        names = [f"images/images/product_{n}.jpg" for n in range(options["names"])]
+        repeat = options["repeat"]
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for name in names:
+                storage.url(name)
+        direct = (time.perf_counter() - start) / repeat * 1000
+
+        cache = MediaURLCache()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for name in names:
+                cache.resolve(name, storage)
+        cached = (time.perf_counter() - start) / repeat * 1000
+
+        self.stdout.write(f"{options['storage']} storage, {len(names)} urls per render, {repeat} renders")
+        self.stdout.write(f"  storage.url()  {direct:8.3f} ms/render")
+        self.stdout.write(f"  memoized       {cached:8.3f} ms/render  {cache.snapshot()}")
+
+    def get_storage(self, kind):
+        if kind == "local":
+            return FileSystemStorage()
+        import cloudinary
+        from cloudinary_storage.storage import MediaCloudinaryStorage
+
+        if not cloudinary.config().cloud_name:
+            cloudinary.config(cloud_name="benchmark")
+        return MediaCloudinaryStorage()
@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ecommerceapp.models import Product
+from ecommerceapp.search import IcontainsSearchBackend, get_search_backend
+
+
+WORDS = (
+    "herbal", "neem", "aloe", "tulsi", "turmeric", "sandal", "rose", "amla",
+    "bhringraj", "coconut", "almond", "saffron", "charcoal", "honey", "mint",
+    "lavender", "hibiscus", "reetha", "shikakai", "multani",
+)
+CATEGORIES = ("Soap", "Shampoo", "Hair Oil", "Face Pack", "Face Wash", "Body Lotion", "Combo")
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway catalog and compare full-text search with the "
+        "icontains search. All seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["products"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, total, repeat):
+        rng = random.Random(42)
+        start = time.perf_counter()
+        batch = []
+        for n in range(total):
+            words = rng.sample(WORDS, 3)
+            batch.append(Product(
+                product_name=f"{words[0].title()} {words[1].title()} {n}",
+                category=rng.choice(CATEGORIES),
+                subcategory=words[2],
+                desc=" ".join(rng.sample(WORDS, 8)),
+                mrp=300,
+                selling_price=250,
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        self.stdout.write(f"seeded {total} products in {time.perf_counter() - start:.1f}s")
+
+        backend = get_search_backend()
+        start = time.perf_counter()
+        backend.rebuild()
+        self.stdout.write(f"{backend.name}: index built in {time.perf_counter() - start:.1f}s")
+
+        queries = ["neem", "aloe tulsi", "saffron soap", "bhringraj hair oil", "xyzzy"]
+        for candidate in (IcontainsSearchBackend(), backend):
+            for query in queries:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    hits = candidate.search(query)
+                elapsed = (time.perf_counter() - start) / repeat * 1000
+                self.stdout.write(
+                    f"{candidate.name:>18}  {query!r:<22} {elapsed:8.2f} ms  {len(hits)} hits"
+                )
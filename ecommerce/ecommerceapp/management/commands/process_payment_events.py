@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ecommerceapp.paymentevents import BATCH_SIZE, process_pending
+
+
+class Command(BaseCommand):
+    help = "Apply pending payment events from the webhook ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when drained.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            # A long-running loop must not keep a connection the database
+            # has since dropped.
+            close_old_connections()
+            processed = process_pending(batch_size=options["batch_size"])
+            if processed or not options["loop"]:
+                self.stdout.write(f"process_payment_events: applied {processed} events")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
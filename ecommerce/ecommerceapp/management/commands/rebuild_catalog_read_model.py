@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ecommerceapp import readmodel
+from ecommerceapp.catalog import bump_catalog_version
+from ecommerceapp.models import CatalogCategory
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized storefront catalog (CatalogEntry / CatalogCategory) from Product."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=readmodel.REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = readmodel.rebuild(batch_size=options["batch_size"])
+        bump_catalog_version()
+        self.stdout.write(
+            f"rebuild_catalog_read_model: {total} products in {CatalogCategory.objects.count()} categories"
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from ecommerceapp.models import Orders, summarize_items_json
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored Orders.products_summary column from items_json."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--all", action="store_true", help="Also recompute rows that already have a summary.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        orders = Orders.objects.only("order_id", "items_json", "products_summary").order_by("order_id")
+        if not options["all"]:
+            orders = orders.filter(products_summary="")
+
+        last_id = 0
+        scanned = 0
+        updated = 0
+        while True:
+            batch = list(orders.filter(order_id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].order_id
+            scanned += len(batch)
+            changed = []
+            for order in batch:
+                summary = summarize_items_json(order.items_json)
+                if summary != order.products_summary:
+                    order.products_summary = summary
+                    changed.append(order)
+            # bulk_update skips Orders.save(), so only this column is written.
+            updated += Orders.objects.bulk_update(changed, ["products_summary"])
+
+        self.stdout.write(f"recompute_products_summary: scanned {scanned} orders, updated {updated}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ecommerceapp import metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute the admin dashboard counters from orders, products, contacts and ads."
+
+    def handle(self, *args, **options):
+        count = metrics.rebuild()
+        self.stdout.write(f"repair_dashboard_metrics: wrote {count} counters")
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from ecommerceapp import rollups
+
+
+class Command(BaseCommand):
+    help = "Update the daily order rollups for days after the stored watermark."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="Recompute from this day (YYYY-MM-DD) on.")
+        parser.add_argument("--lookback", type=int, default=rollups.LOOKBACK_DAYS,
+                            help="Days before the watermark to recompute for late status changes.")
+
+    def handle(self, *args, **options):
+        start, end = rollups.roll_up(since=options["since"], lookback=options["lookback"])
+        self.stdout.write(f"rollup_orders: rolled up {start} to {end}")
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+MEDIA_URL_CACHE_SIZE = 4096
+
+
+class MediaURLCache:
+    """Process-wide LRU of storage name -> public URL.
+
+    Stored names never change content (a new upload gets a new name), so
+    a resolved URL stays valid and can be shared across requests.
+    """
+
+    def __init__(self, maxsize=MEDIA_URL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, name, storage=None):
+        with self._lock:
+            url = self._urls.get(name)
+            if url is not None:
+                self._urls.move_to_end(name)
+                self.hits += 1
+                return url
+        url = (storage or default_storage).url(name)
+        with self._lock:
+            self.misses += 1
+            self._urls[name] = url
+            self._urls.move_to_end(name)
+            while len(self._urls) > self.maxsize:
+                self._urls.popitem(last=False)
+        return url
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {"size": len(self._urls), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+url_cache = MediaURLCache(getattr(settings, "MEDIA_URL_CACHE_SIZE", MEDIA_URL_CACHE_SIZE))
+
+
+def media_url(value):
+    """Public URL of a ``FieldFile`` or storage name; '' when empty."""
+    if not value:
+        return ""
+    name = getattr(value, "name", value)
+    storage = getattr(value, "storage", None)
+    return url_cache.resolve(name, storage)
+
+
+@receiver(setting_changed)
+def _clear_on_storage_change(setting, **kwargs):
+    if setting in ("DEFAULT_FILE_STORAGE", "STORAGES", "MEDIA_URL", "CLOUDINARY_STORAGE"):
+        url_cache.clear()
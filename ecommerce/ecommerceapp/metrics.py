@@ -0,0 +1,124 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from ecommerceapp.models import CarouselAd, Contact, DashboardMetric, Orders, Product
+
+# Fields whose values feed the counters, per model. Saves that touch none of
+# them (e.g. storing the gateway order id) cost no metric queries.
+TRACKED_FIELDS = {
+    Orders: ("amount", "paymentstatus", "state"),
+    Product: ("category",),
+    Contact: (),
+    CarouselAd: ("is_active",),
+}
+
+
+def _label(value):
+    return (value or "").strip()
+
+
+def order_metrics(amount, paymentstatus, state):
+    return {
+        ("orders", ""): 1,
+        ("revenue", ""): amount or 0,
+        ("orders_by_status", _label(paymentstatus)): 1,
+        ("orders_by_state", _label(state)): 1,
+    }
+
+
+def product_metrics(category):
+    return {("products", ""): 1, ("products_by_category", _label(category)): 1}
+
+
+def contact_metrics():
+    return {("contacts", ""): 1}
+
+
+def ad_metrics(is_active):
+    return {("active_ads", ""): 1 if is_active else 0}
+
+
+CONTRIBUTIONS = {
+    Orders: order_metrics,
+    Product: product_metrics,
+    Contact: contact_metrics,
+    CarouselAd: ad_metrics,
+}
+
+
+def contributions(model, values):
+    """What one row with ``values`` (tracked field -> value) adds to the counters."""
+    if values is None:
+        return {}
+    return CONTRIBUTIONS[model](**values)
+
+
+def tracked_values(instance):
+    return {name: getattr(instance, name) for name in TRACKED_FIELDS[type(instance)]}
+
+
+def stored_values(model, pk):
+    """Tracked values of the row as currently stored, or None."""
+    fields = TRACKED_FIELDS[model]
+    if not fields:
+        return {}
+    return model.objects.filter(pk=pk).values(*fields).first()
+
+
+def difference(old, new):
+    deltas = Counter(new)
+    deltas.subtract(old)
+    return deltas
+
+
+def collect():
+    """Every counter recomputed from the source tables."""
+    metrics = Counter()
+    orders = Orders.objects.aggregate(total=Count("pk"), revenue=Sum("amount"))
+    metrics[("orders", "")] = orders["total"]
+    metrics[("revenue", "")] = orders["revenue"] or 0
+    for name, field, rows in (
+        ("orders_by_status", "paymentstatus", Orders.objects),
+        ("orders_by_state", "state", Orders.objects),
+        ("products_by_category", "category", Product.objects),
+    ):
+        for value, total in rows.order_by().values_list(field).annotate(total=Count("pk")):
+            metrics[(name, _label(value))] += total
+    metrics[("products", "")] = Product.objects.count()
+    metrics[("contacts", "")] = Contact.objects.count()
+    metrics[("active_ads", "")] = CarouselAd.objects.filter(is_active=True).count()
+    return metrics
+
+
+def rebuild():
+    """Replace the counters with freshly computed values. Returns the row count."""
+    rows = [DashboardMetric(name=name, key=key[:200], value=value) for (name, key), value in collect().items()]
+    with transaction.atomic():
+        DashboardMetric.objects.all().delete()
+        DashboardMetric.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _top(counts, limit, blank_label):
+    items = sorted(((key or blank_label, value) for key, value in counts.items() if value > 0),
+                   key=lambda item: (-item[1], item[0]))
+    return items[:limit] if limit else items
+
+
+def dashboard():
+    """The dashboard numbers, read from the counters table in one query."""
+    groups = defaultdict(dict)
+    for name, key, value in DashboardMetric.objects.values_list("name", "key", "value"):
+        groups[name][key] = value
+    return {
+        "total_orders": groups["orders"].get("", 0),
+        "total_revenue": groups["revenue"].get("", 0),
+        "total_products": groups["products"].get("", 0),
+        "total_contacts": groups["contacts"].get("", 0),
+        "active_ads": groups["active_ads"].get("", 0),
+        "payment": _top(groups["orders_by_status"], None, "Unknown"),
+        "state": _top(groups["orders_by_state"], 7, "Unknown"),
+        "category": _top(groups["products_by_category"], 7, "Uncategorized"),
+    }
@@ -0,0 +1,70 @@
+# Full-text search index for the homepage ?query= search.
+# SQLite gets an FTS5 virtual table, PostgreSQL a tsvector table with a GIN
+# index. Other vendors keep using the icontains search.
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS ecommerceapp_product_fts USING fts5(
+    product_name, category, subcategory, description,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+SQLITE_FILL = """
+INSERT INTO ecommerceapp_product_fts (rowid, product_name, category, subcategory, description)
+SELECT id, product_name, category, subcategory, "desc" FROM ecommerceapp_product
+"""
+SQLITE_DROP = "DROP TABLE IF EXISTS ecommerceapp_product_fts"
+
+POSTGRES_CREATE = """
+CREATE TABLE IF NOT EXISTS ecommerceapp_product_search (
+    product_id bigint PRIMARY KEY,
+    document tsvector NOT NULL
+)
+"""
+POSTGRES_INDEX = """
+CREATE INDEX IF NOT EXISTS ecommerceapp_product_search_document_gin
+ON ecommerceapp_product_search USING GIN (document)
+"""
+POSTGRES_FILL = """
+INSERT INTO ecommerceapp_product_search (product_id, document)
+SELECT id,
+    setweight(to_tsvector('simple', coalesce(product_name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(subcategory, '')), 'C') ||
+    setweight(to_tsvector('simple', coalesce("desc", '')), 'D')
+FROM ecommerceapp_product
+"""
+POSTGRES_DROP = "DROP TABLE IF EXISTS ecommerceapp_product_search"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        statements = [SQLITE_CREATE, SQLITE_FILL]
+    elif vendor == "postgresql":
+        statements = [POSTGRES_CREATE, POSTGRES_INDEX, POSTGRES_FILL]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_DROP)
+    elif vendor == "postgresql":
+        schema_editor.execute(POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0015_alter_contact_phonenumber'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
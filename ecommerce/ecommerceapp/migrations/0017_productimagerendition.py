@@ -0,0 +1,34 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0016_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('source_name', models.CharField(max_length=255)),
+                ('format', models.CharField(max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('file', models.FileField(max_length=255, upload_to='images/renditions')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='ecommerceapp.product')),
+            ],
+            options={
+                'ordering': ['product', 'slot', 'format', 'width'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productimagerendition',
+            constraint=models.UniqueConstraint(fields=('product', 'slot', 'format', 'width'), name='unique_product_image_rendition'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:14
+# Tables only; fill them with `python manage.py rebuild_catalog_read_model`.
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0017_productimagerendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(max_length=100)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('first_product_id', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog categories',
+                'ordering': ['first_product_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='ecommerceapp.product')),
+                ('product_name', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=100)),
+                ('category_slug', models.SlugField(max_length=100)),
+                ('subcategory', models.CharField(max_length=50)),
+                ('desc', models.CharField(max_length=300)),
+                ('mrp', models.IntegerField()),
+                ('selling_price', models.IntegerField()),
+                ('offer_percentage', models.IntegerField()),
+                ('image_urls', models.JSONField(default=list)),
+                ('pictures', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['product'],
+                'indexes': [models.Index(fields=['category_slug', 'product'], name='catalog_entry_slug_product')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0018_catalog_read_model'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['email', '-order_id'], name='orders_email_order_id'),
+        ),
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(condition=models.Q(('razorpay_order_id__isnull', False)), fields=['razorpay_order_id'], name='orders_razorpay_order_id'),
+        ),
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['created_at'], name='orders_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='orderupdate',
+            index=models.Index(fields=['order_id', 'update_id'], name='orderupdate_order_id'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'id'], name='product_category_id'),
+        ),
+        migrations.AddIndex(
+            model_name='shopcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['display_order', 'id'], name='shopcategory_active_order'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0020_orderitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orders',
+            name='products_summary',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0022_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orders',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
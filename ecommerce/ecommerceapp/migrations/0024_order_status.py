@@ -0,0 +1,52 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:26
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import DateTimeField, F, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+EXPECTED_DELIVERY_DAYS = 10
+
+
+def backfill_order_status(apps, schema_editor):
+    Orders = apps.get_model('ecommerceapp', 'Orders')
+    OrderUpdate = apps.get_model('ecommerceapp', 'OrderUpdate')
+
+    def first_update(**flags):
+        updates = OrderUpdate.objects.filter(order_id=OuterRef('order_id'), **flags).order_by('timestamp', 'update_id')
+        return Subquery(updates.annotate(at=Cast('timestamp', DateTimeField())).values('at')[:1])
+
+    Orders.objects.filter(created_at__isnull=False).update(
+        expected_delivery=F('created_at') + timedelta(days=EXPECTED_DELIVERY_DAYS),
+    )
+    Orders.objects.update(
+        delivered_at=first_update(delivered=True),
+        cancelled_at=first_update(cancelled=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0023_orders_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orders',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='orders',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='orders',
+            name='expected_delivery',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_order_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# First half of turning OrderUpdate.order_id into a foreign key: allow NULL
+# and clear ids that point at no order, so the constraint added by 0026 can
+# be validated. Batches commit one at a time to keep locks short on large
+# tables; rerunning after an interruption only revisits unfinished rows.
+from django.db import migrations, models, transaction
+from django.db.models import Exists, OuterRef
+
+BATCH_SIZE = 1000
+
+
+def null_orphaned_updates(apps, schema_editor):
+    Orders = apps.get_model('ecommerceapp', 'Orders')
+    OrderUpdate = apps.get_model('ecommerceapp', 'OrderUpdate')
+    db = schema_editor.connection.alias
+    updates = OrderUpdate.objects.using(db).order_by('update_id')
+    has_order = Exists(Orders.objects.using(db).filter(order_id=OuterRef('order_id')))
+    last_id = 0
+    while True:
+        ids = list(updates.filter(update_id__gt=last_id).values_list('update_id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            return
+        last_id = ids[-1]
+        with transaction.atomic(using=db):
+            OrderUpdate.objects.using(db).filter(update_id__in=ids, order_id__isnull=False).exclude(
+                has_order
+            ).update(order_id=None)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('ecommerceapp', '0024_order_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderupdate',
+            name='order_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(null_orphaned_updates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Second half: the integer column becomes OrderUpdate.order. The column keeps
+# its name, so the state change alone moves no data; the AlterField then adds
+# the foreign key constraint on the already-cleaned column.
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0025_orderupdate_null_orphans'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderupdate',
+            name='orderupdate_order_id',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='orderupdate',
+                    name='order_id',
+                ),
+                migrations.AddField(
+                    model_name='orderupdate',
+                    name='order',
+                    field=models.ForeignKey(
+                        blank=True, null=True, db_column='order_id', db_constraint=False, db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE, related_name='updates', to='ecommerceapp.orders',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='orderupdate',
+            name='order',
+            field=models.ForeignKey(
+                blank=True, null=True, db_column='order_id', db_index=False,
+                on_delete=django.db.models.deletion.CASCADE, related_name='updates', to='ecommerceapp.orders',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='orderupdate',
+            index=models.Index(fields=['order', 'update_id'], name='orderupdate_order_id'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0026_orderupdate_order_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('key', models.CharField(blank=True, default='', max_length=200)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardmetric',
+            constraint=models.UniqueConstraint(fields=('name', 'key'), name='dashboardmetric_name_key'),
+        ),
+    ]
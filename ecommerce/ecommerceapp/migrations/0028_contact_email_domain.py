@@ -0,0 +1,22 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0027_dashboardmetric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='email_domain',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['email_domain'], name='contact_email_domain'),
+        ),
+    ]
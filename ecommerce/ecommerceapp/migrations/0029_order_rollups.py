@@ -0,0 +1,56 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0028_contact_email_domain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+                ('paid_revenue', models.BigIntegerField(default=0)),
+                ('pending_orders', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily order stats',
+                'verbose_name_plural': 'Daily order stats',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStateOrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('state', models.CharField(blank=True, default='', max_length=100)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily order stats by state',
+                'verbose_name_plural': 'Daily order stats by state',
+                'ordering': ['day', 'state'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailystateorderstats',
+            constraint=models.UniqueConstraint(fields=('day', 'state'), name='dailystateorderstats_day_state'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.28 on 2026-10-18 14:44
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_products_without_renditions(apps, schema_editor):
+    Product = apps.get_model('ecommerceapp', 'Product')
+    has_image = ~Q(image1__in=['', None]) | ~Q(image2__in=['', None]) | ~Q(image3__in=['', None])
+    Product.objects.filter(has_image, renditions__isnull=True).update(renditions_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0029_order_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='renditions_pending',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('renditions_pending', True)), fields=['id'], name='product_renditions_pending'),
+        ),
+        migrations.RunPython(mark_products_without_renditions, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,20 @@
 import json
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Shown on the profile page until the order is delivered or cancelled.
+EXPECTED_DELIVERY_DAYS = 10
+
+
+def email_domain_of(email):
+    """``"example.com"`` for ``"A@Example.com"``; ``"invalid-email"`` without an @."""
+    value = (email or "").strip().lower()
+    if "@" in value:
+        return value.split("@", 1)[1][:254]
+    return "invalid-email" if value else ""
 
 
 class Contact(models.Model):
@@ -7,10 +22,26 @@ class Contact(models.Model):
     email = models.EmailField()
     desc = models.TextField(max_length=500)
     phonenumber = models.IntegerField()
+    # Derived from email on save, for the dashboard domain chart and the
+    # admin domain filter.
+    email_domain = models.CharField(max_length=254, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["email_domain"], name="contact_email_domain"),
+        ]
 
     def __int__(self):
         return self.id
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "email" in update_fields:
+            self.email_domain = email_domain_of(self.email)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"email_domain"}
+        super().save(*args, **kwargs)
+
 
 class Product(models.Model):
     product_name = models.CharField(max_length=100)
@@ -26,10 +57,60 @@ class Product(models.Model):
     image1 = models.ImageField(upload_to='images/images', blank=True, null=True)
     image2 = models.ImageField(upload_to='images/images', blank=True, null=True)
     image3 = models.ImageField(upload_to='images/images', blank=True, null=True)
+    # Set when an image changes; backfill_renditions resizes them later so
+    # saves never wait on image encoding.
+    renditions_pending = models.BooleanField(default=False, editable=False)
+
+    IMAGE_FIELDS = ("image1", "image2", "image3")
+
+    class Meta:
+        indexes = [
+            # Category sections and their keyset pages.
+            models.Index(fields=["category", "id"], name="product_category_id"),
+            models.Index(fields=["id"], name="product_renditions_pending", condition=models.Q(renditions_pending=True)),
+        ]
 
     def __str__(self):
         return self.product_name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_images()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_images(fields)
+
+    def _remember_images(self, fields=None):
+        """Record the stored image names that later saves compare against."""
+        deferred = self.get_deferred_fields()
+        stored = self.__dict__.setdefault("_stored_images", {})
+        for name in self.IMAGE_FIELDS:
+            if name not in deferred and (fields is None or name in fields):
+                stored[name] = getattr(self, name).name or ""
+
+    def _changed_images(self):
+        stored = getattr(self, "_stored_images", {})
+        deferred = self.get_deferred_fields()
+        return {
+            name for name in self.IMAGE_FIELDS
+            if name not in deferred and (getattr(self, name).name or "") != stored.get(name, "")
+        }
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        changed = self._changed_images()
+        if update_fields is not None:
+            changed &= set(update_fields)
+        if changed:
+            self.renditions_pending = True
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"renditions_pending"}
+        super().save(*args, **kwargs)
+        self._remember_images(update_fields)
+
     @property
     def offer_percentage(self):
         if self.mrp > 0:
@@ -38,6 +119,131 @@ class Product(models.Model):
         return 0
 
 
+class ProductImageRendition(models.Model):
+    """A resized copy of one of a product's images, used for srcset."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="renditions")
+    slot = models.PositiveSmallIntegerField()  # 1, 2 or 3 -> image1..image3
+    source_name = models.CharField(max_length=255)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(upload_to='images/renditions', max_length=255)
+
+    class Meta:
+        ordering = ["product", "slot", "format", "width"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "slot", "format", "width"],
+                name="unique_product_image_rendition",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} image{self.slot} {self.width}w {self.format}"
+
+
+class CatalogEntry(models.Model):
+    """Storefront read model: one flat, precomputed row per product.
+
+    Maintained by ``ecommerceapp.readmodel``; never edit by hand.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="catalog_entry"
+    )
+    product_name = models.CharField(max_length=100)
+    category = models.CharField(max_length=100)
+    category_slug = models.SlugField(max_length=100)
+    subcategory = models.CharField(max_length=50)
+    desc = models.CharField(max_length=300)
+    mrp = models.IntegerField()
+    selling_price = models.IntegerField()
+    offer_percentage = models.IntegerField()
+    # Original image URLs, and per slot (image1..image3) the resolved
+    # <picture> data or None; see images.picture_data().
+    image_urls = models.JSONField(default=list)
+    pictures = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["product"]
+        indexes = [
+            models.Index(fields=["category_slug", "product"], name="catalog_entry_slug_product"),
+        ]
+
+    def __str__(self):
+        return self.product_name
+
+    @property
+    def id(self):
+        return self.product_id
+
+    def picture(self, slot):
+        if slot and len(self.pictures) >= slot:
+            return self.pictures[slot - 1]
+        return None
+
+    @property
+    def image1(self):
+        return self.picture(1)
+
+    @property
+    def image2(self):
+        return self.picture(2)
+
+    @property
+    def image3(self):
+        return self.picture(3)
+
+
+class CatalogCategory(models.Model):
+    """Per-category summary of the catalog read model."""
+
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=100)
+    product_count = models.PositiveIntegerField(default=0)
+    first_product_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["first_product_id"]
+        verbose_name_plural = "Catalog categories"
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def anchor(self):
+        return f"category-{self.slug}"
+
+
+def summarize_items_json(items_json):
+    """Human-readable "2x- Name, 1x- Other" summary of a cart JSON blob."""
+    if not items_json:
+        return ""
+
+    try:
+        cart_data = json.loads(items_json)
+    except (TypeError, ValueError):
+        return items_json
+
+    if not isinstance(cart_data, dict):
+        return items_json
+
+    formatted_items = []
+    for values in cart_data.values():
+        if not isinstance(values, (list, tuple)) or len(values) < 2:
+            continue
+        quantity = values[0]
+        product_name = str(values[1]).strip()
+        if not product_name:
+            continue
+        formatted_items.append(f"{quantity}x- {product_name}")
+
+    return ", ".join(formatted_items) if formatted_items else items_json
+
+
 class Orders(models.Model):
     order_id = models.AutoField(primary_key=True)
     items_json = models.CharField(max_length=5000)
@@ -58,46 +264,220 @@ class Orders(models.Model):
 
     phone = models.CharField(max_length=100, default="")
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    # Issued with the checkout form; a resubmitted form finds its order.
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    # "2x- Neem Soap, 1x- Hair Oil", derived from items_json on save.
+    products_summary = models.TextField(blank=True, default="", editable=False)
+    # Kept current from OrderUpdate rows by refresh_order_status(); together
+    # with paymentstatus ("Delivered"/"Cancelled") they are the order status.
+    delivered_at = models.DateTimeField(null=True, blank=True, editable=False)
+    cancelled_at = models.DateTimeField(null=True, blank=True, editable=False)
+    expected_delivery = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Profile page: a customer's orders, newest first.
+            models.Index(fields=["email", "-order_id"], name="orders_email_order_id"),
+            # payment_success looks orders up by gateway id; most rows
+            # created before checkout completes have none.
+            models.Index(
+                fields=["razorpay_order_id"],
+                name="orders_razorpay_order_id",
+                condition=models.Q(razorpay_order_id__isnull=False),
+            ),
+            # Dashboard orders-per-day chart.
+            models.Index(fields=["created_at"], name="orders_created_at"),
+        ]
 
     def __str__(self):
         return self.name
 
-    def get_products_summary(self):
-        if not self.items_json:
-            return ""
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "items_json" in update_fields:
+            self.products_summary = summarize_items_json(self.items_json)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"products_summary"}
+        if self._state.adding and self.expected_delivery is None:
+            self.expected_delivery = (self.created_at or timezone.now()) + timedelta(days=EXPECTED_DELIVERY_DAYS)
+        super().save(*args, **kwargs)
 
-        try:
-            cart_data = json.loads(self.items_json)
-        except (TypeError, ValueError):
-            return self.items_json
+    @property
+    def amount_paise(self):
+        """What the Razorpay order is created for; the gateway minimum is Rs 1."""
+        return max(100, self.amount * 100)
+
+    @property
+    def is_delivered(self):
+        return self.delivered_at is not None
 
-        if not isinstance(cart_data, dict):
-            return self.items_json
+    @property
+    def is_cancelled(self):
+        return self.cancelled_at is not None
 
-        formatted_items = []
-        for values in cart_data.values():
-            if not isinstance(values, (list, tuple)) or len(values) < 2:
-                continue
-            quantity = values[0]
-            product_name = str(values[1]).strip()
-            if not product_name:
-                continue
-            formatted_items.append(f"{quantity}x- {product_name}")
+    @property
+    def paymentstatus_display(self):
+        if self.is_cancelled:
+            return "Cancelled"
+        return self.paymentstatus or "Pending"
 
-        return ", ".join(formatted_items) if formatted_items else self.items_json
+    def get_products_summary(self):
+        # Stored at write time; rows saved before the column existed are
+        # summarized on the fly until recompute_products_summary runs.
+        if self.products_summary:
+            return self.products_summary
+        return summarize_items_json(self.items_json)
 
 
 class OrderUpdate(models.Model):
     update_id = models.AutoField(primary_key=True)
-    order_id = models.IntegerField(default="")
+    # Keeps the historical "order_id" column, so order_id= lookups and
+    # constructors are unchanged. The (order, update_id) index below covers
+    # the foreign key. Rows whose order no longer existed were set to NULL
+    # when the key was introduced.
+    order = models.ForeignKey(
+        Orders,
+        on_delete=models.CASCADE,
+        related_name="updates",
+        db_column="order_id",
+        db_index=False,
+        null=True,
+        blank=True,
+    )
     update_desc = models.CharField(max_length=5000)
     delivered = models.BooleanField(default=False)
     cancelled = models.BooleanField(default=False)
     timestamp = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["order", "update_id"], name="orderupdate_order_id"),
+        ]
+
     def __str__(self):
         return self.update_desc[0:7] + "..."
 
+    def save(self, *args, **kwargs):
+        # A new update without flags cannot change the order's status; an
+        # edited one may have had its flags cleared.
+        refresh = not self._state.adding or self.delivered or self.cancelled
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if refresh:
+                refresh_order_status(self.order_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            refresh_order_status(self.order_id)
+        return result
+
+
+def refresh_order_status(order_id):
+    """Recompute one order's denormalized status; see refresh_orders_status()."""
+    return refresh_orders_status(Orders.objects.filter(order_id=order_id))
+
+
+def refresh_orders_status(orders):
+    """Recompute the denormalized status of every order in ``orders`` in one UPDATE.
+
+    Any cancelled update cancels the order; otherwise any delivered update
+    delivers it. Clearing both flags falls back to Paid or Pending. The first
+    delivered/cancelled timestamps are kept across repeated refreshes.
+    """
+    updates = OrderUpdate.objects.filter(order=models.OuterRef("pk"))
+    cancelled = models.Exists(updates.filter(cancelled=True))
+    delivered = models.Exists(updates.filter(delivered=True))
+    now = timezone.now()
+    paid = models.Q(amountpaid__isnull=False) & ~models.Q(amountpaid="")
+    before = order_status_counts(orders)
+    changed = orders.update(
+        cancelled_at=models.Case(
+            models.When(cancelled, then=Coalesce("cancelled_at", models.Value(now))),
+            default=None,
+        ),
+        delivered_at=models.Case(
+            models.When(delivered, then=Coalesce("delivered_at", models.Value(now))),
+            default=None,
+        ),
+        paymentstatus=models.Case(
+            models.When(cancelled, then=models.Value("Cancelled")),
+            models.When(delivered, then=models.Value("Delivered")),
+            models.When(paid & models.Q(paymentstatus__in=("Delivered", "Cancelled")), then=models.Value("Paid")),
+            models.When(paymentstatus__in=("Delivered", "Cancelled"), then=models.Value("Pending")),
+            default=models.F("paymentstatus"),
+        ),
+    )
+    if changed:
+        DashboardMetric.objects.adjust_order_statuses(before, order_status_counts(orders))
+    return changed
+
+
+def order_status_counts(orders):
+    """``{paymentstatus: count}`` over ``orders``, for status-metric deltas."""
+    rows = orders.order_by().values_list("paymentstatus").annotate(total=models.Count("pk"))
+    return dict(rows)
+
+
+class OrderItem(models.Model):
+    """One cart line of an order."""
+
+    order = models.ForeignKey(Orders, on_delete=models.CASCADE, related_name="items")
+    # Null once the product is deleted; the name and price stay as sold.
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, blank=True, related_name="order_items", db_index=False
+    )
+    product_name = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # Per-product sales aggregates; also serves the product FK.
+            models.Index(fields=["product", "order"], name="orderitem_product_order"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_name}"
+
+    @property
+    def line_total(self):
+        return self.quantity * self.unit_price
+
+
+class PaymentEvent(models.Model):
+    """Idempotency ledger of payment notifications (webhooks and browser callbacks).
+
+    ``key`` is unique, so a redelivered event is dropped at insert time;
+    ``ecommerceapp.paymentevents`` applies pending rows in batches, each
+    event in its own savepoint.
+    """
+
+    key = models.CharField(max_length=120, unique=True)
+    source = models.CharField(max_length=20)  # "webhook" or "browser"
+    event = models.CharField(max_length=50)
+    razorpay_order_id = models.CharField(max_length=150, blank=True)
+    razorpay_payment_id = models.CharField(max_length=150, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    # Captured amount reported by the gateway, if the event carries one.
+    amount_paise = models.PositiveIntegerField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, blank=True)
+    # Failed processing runs; the event is given up on after MAX_ATTEMPTS.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["id"], name="paymentevent_pending", condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return self.key
+
 
 class CarouselAd(models.Model):
     title = models.CharField(max_length=150, blank=True)
@@ -125,8 +505,113 @@ class ShopCategory(models.Model):
 
     class Meta:
         ordering = ["display_order", "id"]
+        indexes = [
+            # The homepage only lists active categories, in display order.
+            models.Index(
+                fields=["display_order", "id"],
+                name="shopcategory_active_order",
+                condition=models.Q(is_active=True),
+            ),
+        ]
         verbose_name = "Shop Category"
         verbose_name_plural = "Shop Categories"
 
     def __str__(self):
         return self.section_name
+
+
+class DashboardMetricQuerySet(models.QuerySet):
+    def adjust(self, deltas):
+        """Add ``{(name, key): delta}`` to the counters in two queries."""
+        deltas = {(name, key[:200]): delta for (name, key), delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.bulk_create(
+            [DashboardMetric(name=name, key=key) for name, key in deltas],
+            ignore_conflicts=True,
+        )
+        match = models.Q()
+        whens = []
+        for (name, key), delta in deltas.items():
+            condition = models.Q(name=name, key=key)
+            match |= condition
+            whens.append(models.When(condition, then=models.Value(delta)))
+        self.filter(match).update(value=models.F("value") + models.Case(*whens, default=models.Value(0)))
+
+    def adjust_order_statuses(self, before, after):
+        deltas = {}
+        for status in set(before) | set(after):
+            key = ("orders_by_status", (status or "").strip())
+            deltas[key] = deltas.get(key, 0) + after.get(status, 0) - before.get(status, 0)
+        self.adjust(deltas)
+
+
+class DashboardMetric(models.Model):
+    """One admin dashboard counter, e.g. ("orders_by_state", "Kerala").
+
+    Kept current from order, product, contact and ad writes (see metrics.py);
+    repair_dashboard_metrics rebuilds the table from the source rows.
+    """
+
+    name = models.CharField(max_length=50)
+    key = models.CharField(max_length=200, blank=True, default="")
+    value = models.BigIntegerField(default=0)
+
+    objects = DashboardMetricQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "key"], name="dashboardmetric_name_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.key}] = {self.value}"
+
+
+class DailyOrderStats(models.Model):
+    """Orders and revenue for one local calendar day, maintained by rollups.py."""
+
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    paid_revenue = models.BigIntegerField(default=0)
+    pending_orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["day"]
+        verbose_name = "Daily order stats"
+        verbose_name_plural = "Daily order stats"
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} orders"
+
+
+class DailyStateOrderStats(models.Model):
+    """Orders and revenue per state for one local calendar day."""
+
+    day = models.DateField()
+    state = models.CharField(max_length=100, blank=True, default="")
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["day", "state"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "state"], name="dailystateorderstats_day_state"),
+        ]
+        verbose_name = "Daily order stats by state"
+        verbose_name_plural = "Daily order stats by state"
+
+    def __str__(self):
+        return f"{self.day} {self.state}: {self.orders} orders"
+
+
+class RollupWatermark(models.Model):
+    """The last day a rollup treats as complete."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    day = models.DateField()
+
+    def __str__(self):
+        return f"{self.name} through {self.day}"
@@ -0,0 +1,82 @@
+import json
+import re
+
+from django.db.models import Count, F, Sum
+
+from ecommerceapp.models import OrderItem, Product
+
+_PRICE_RE = re.compile(r"[^\d.]")
+
+
+def parse_cart(items_json):
+    """Parse the storefront cart JSON into ``(product_id, name, qty, unit_price)``.
+
+    The cart maps product ids to ``[quantity, name, "₹price"]``. Lines
+    that cannot be read are skipped; ``product_id`` is None when the key
+    is not a product id.
+    """
+    try:
+        cart = json.loads(items_json or "{}")
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(cart, dict):
+        return []
+
+    lines = []
+    for key, values in cart.items():
+        if not isinstance(values, (list, tuple)) or len(values) < 2:
+            continue
+        name = str(values[1]).strip()
+        try:
+            quantity = int(values[0])
+        except (TypeError, ValueError):
+            continue
+        if not name or quantity <= 0:
+            continue
+        try:
+            unit_price = int(float(_PRICE_RE.sub("", str(values[2])) or 0)) if len(values) > 2 else 0
+        except ValueError:
+            unit_price = 0
+        product_id = int(key) if str(key).isdigit() else None
+        lines.append((product_id, name[:100], quantity, unit_price))
+    return lines
+
+
+def build_order_items(orders):
+    """Unsaved ``OrderItem`` rows for ``(order, items_json)`` pairs.
+
+    Checks all referenced product ids in one query; lines for products
+    that no longer exist keep their name and price without a product.
+    """
+    parsed = [(order, parse_cart(items_json)) for order, items_json in orders]
+    wanted = {product_id for _, lines in parsed for product_id, *_ in lines if product_id}
+    existing = set(Product.objects.filter(id__in=wanted).values_list("id", flat=True)) if wanted else set()
+    return [
+        OrderItem(
+            order=order,
+            product_id=product_id if product_id in existing else None,
+            product_name=name,
+            quantity=quantity,
+            unit_price=unit_price,
+        )
+        for order, lines in parsed
+        for product_id, name, quantity, unit_price in lines
+    ]
+
+
+def create_order_items(order, items_json):
+    return OrderItem.objects.bulk_create(build_order_items([(order, items_json)]))
+
+
+def sales_by_product():
+    """Units, revenue and order count per product, best sellers first."""
+    return (
+        OrderItem.objects.filter(product__isnull=False)
+        .values("product_id", "product__product_name")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("quantity") * F("unit_price")),
+            orders=Count("order", distinct=True),
+        )
+        .order_by("-units", "product_id")
+    )
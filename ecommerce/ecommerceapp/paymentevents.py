@@ -0,0 +1,164 @@
+import logging
+
+from django.db import transaction
+from django.db.models import CharField, F
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from ecommerceapp.models import DashboardMetric, OrderUpdate, Orders, PaymentEvent, order_status_counts
+
+logger = logging.getLogger(__name__)
+
+PAID_EVENTS = {"payment.captured", "order.paid", "payment.verified"}
+FAILED_EVENTS = {"payment.failed"}
+# Statuses a payment may still move out of; anything else (Paid,
+# Delivered, Cancelled) makes a late or repeated notification a no-op.
+PAYABLE_STATUSES = ("", "Pending", "Failed")
+FAILABLE_STATUSES = ("", "Pending")
+BATCH_SIZE = 100
+# Processing runs an event may fail before it is marked "failed" and left
+# for someone to look at in the admin.
+MAX_ATTEMPTS = 5
+
+
+def _entity(payload, name):
+    return ((payload.get("payload") or {}).get(name) or {}).get("entity") or {}
+
+
+def _paise(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def event_from_webhook(payload, event_id=""):
+    """Build the ledger row for a Razorpay webhook body."""
+    name = str(payload.get("event") or "")
+    payment = _entity(payload, "payment")
+    order = _entity(payload, "order")
+    order_id = payment.get("order_id") or order.get("id") or ""
+    payment_id = payment.get("id") or ""
+    return PaymentEvent(
+        key=event_id or f"{name}:{payment_id or order_id}",
+        source="webhook",
+        event=name,
+        razorpay_order_id=order_id,
+        razorpay_payment_id=payment_id,
+        payload=payload,
+        amount_paise=_paise(payment.get("amount", order.get("amount_paid"))),
+    )
+
+
+def event_from_browser(order_id, payment_id):
+    """Ledger row for a verified checkout callback."""
+    return PaymentEvent(
+        key=f"payment.verified:{payment_id}",
+        source="browser",
+        event="payment.verified",
+        razorpay_order_id=order_id,
+        razorpay_payment_id=payment_id,
+    )
+
+
+def record(event):
+    """Append ``event`` to the ledger; a duplicate key is silently dropped."""
+    PaymentEvent.objects.bulk_create([event], ignore_conflicts=True)
+
+
+def apply_event(event, order):
+    """Apply one event to its order. Returns ``(outcome, OrderUpdate or None)``."""
+    if order is None:
+        return "unknown-order", None
+    if event.event in PAID_EVENTS:
+        # Browser callbacks carry no amount; their signature ties them to
+        # the gateway order, which was created for order.amount_paise.
+        if event.amount_paise is not None and event.amount_paise != order.amount_paise:
+            logger.warning(
+                "payment event %s captured %s paise for order %s, expected %s",
+                event.key, event.amount_paise, order.order_id, order.amount_paise,
+            )
+            return "amount-mismatch", None
+        # Conditional update: only the first paid notification for an
+        # order changes it, whichever process or source wins.
+        changed = Orders.objects.filter(
+            pk=order.pk, paymentstatus__in=PAYABLE_STATUSES
+        ).update(paymentstatus="Paid", amountpaid=Cast(F("amount"), CharField()))
+        if changed:
+            return "applied", OrderUpdate(order_id=order.order_id, update_desc="Payment successful")
+        return "noop", None
+    if event.event in FAILED_EVENTS:
+        changed = Orders.objects.filter(
+            pk=order.pk, paymentstatus__in=FAILABLE_STATUSES
+        ).update(paymentstatus="Failed")
+        if changed:
+            return "applied", OrderUpdate(order_id=order.order_id, update_desc="Payment failed")
+        return "noop", None
+    return "ignored", None
+
+
+def process_batch(events):
+    """Apply a batch of ledger events in one transaction. Returns outcomes.
+
+    Each event runs in its own savepoint: one that raises is rolled back
+    alone and retried by a later drain, up to MAX_ATTEMPTS, while the rest
+    of the batch is applied.
+    """
+    outcomes = {}
+    failures = []
+    with transaction.atomic():
+        orders = {
+            order.razorpay_order_id: order
+            for order in Orders.objects.filter(
+                razorpay_order_id__in={event.razorpay_order_id for event in events if event.razorpay_order_id}
+            ).only("order_id", "razorpay_order_id", "amount")
+        }
+        touched = Orders.objects.filter(pk__in=[order.pk for order in orders.values()])
+        before = order_status_counts(touched) if orders else {}
+        updates = []
+        for event in events:
+            try:
+                with transaction.atomic():
+                    outcome, update = apply_event(event, orders.get(event.razorpay_order_id))
+            except Exception as exc:
+                logger.exception("payment event %s failed (attempt %s)", event.key, event.attempts + 1)
+                failures.append((event, exc))
+                continue
+            if update is not None:
+                updates.append(update)
+            outcomes.setdefault(outcome, []).append(event.pk)
+
+        OrderUpdate.objects.bulk_create(updates)
+        if updates:
+            DashboardMetric.objects.adjust_order_statuses(before, order_status_counts(touched))
+        now = timezone.now()
+        for outcome, pks in outcomes.items():
+            PaymentEvent.objects.filter(pk__in=pks).update(processed_at=now, outcome=outcome)
+        for event, exc in failures:
+            attempts = event.attempts + 1
+            done = {"processed_at": now, "outcome": "failed"} if attempts >= MAX_ATTEMPTS else {}
+            PaymentEvent.objects.filter(pk=event.pk).update(attempts=attempts, last_error=repr(exc)[:2000], **done)
+            if done:
+                outcomes.setdefault("failed", []).append(event.pk)
+    return {outcome: len(pks) for outcome, pks in outcomes.items()}
+
+
+def process_pending(batch_size=BATCH_SIZE, queryset=None):
+    """Drain pending ledger events in batches. Returns the number processed.
+
+    Each batch is claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` and
+    applied in the same transaction, so the worker and a checkout callback
+    draining at the same time never apply or count an attempt twice.
+    """
+    pending = queryset if queryset is not None else PaymentEvent.objects.all()
+    pending = pending.filter(processed_at__isnull=True).order_by("id")
+    total = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(pending.filter(id__gt=last_id).select_for_update(skip_locked=True)[:batch_size])
+            if not batch:
+                return total
+            last_id = batch[-1].id
+            process_batch(batch)
+        total += len(batch)
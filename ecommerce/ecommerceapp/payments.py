@@ -0,0 +1,260 @@
+import hashlib
+import hmac
+import importlib.metadata
+import itertools
+import logging
+import threading
+import time
+
+import razorpay
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayError(Exception):
+    """The gateway rejected or failed a request."""
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """The gateway timed out, is unreachable, or the circuit is open."""
+
+
+# ==============================
+# Signatures (no client needed)
+# ==============================
+def _hmac_sha256(secret, message):
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify_payment_signature(order_id, payment_id, signature, secret=None):
+    """Check the checkout callback signature: HMAC-SHA256 of "order_id|payment_id"."""
+    secret = settings.RAZORPAY_KEY_SECRET if secret is None else secret
+    if not (secret and order_id and payment_id and signature):
+        return False
+    expected = _hmac_sha256(secret, f"{order_id}|{payment_id}".encode("utf-8"))
+    return hmac.compare_digest(expected, str(signature))
+
+
+def verify_webhook_signature(body, signature, secret=None):
+    """Check an ``X-Razorpay-Signature`` header: HMAC-SHA256 of the raw body."""
+    secret = settings.RAZORPAY_WEBHOOK_SECRET if secret is None else secret
+    if not (secret and signature):
+        return False
+    return hmac.compare_digest(_hmac_sha256(secret, body), str(signature))
+
+
+# ==============================
+# Circuit breaker
+# ==============================
+class CircuitBreaker:
+    """Fail fast after repeated gateway failures.
+
+    After ``threshold`` consecutive failures the circuit opens and calls are
+    refused for ``reset_timeout`` seconds; then a single trial call is let
+    through, closing the circuit on success or reopening it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning("payment gateway circuit opened after %d failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+# ==============================
+# Gateways
+# ==============================
+class TimeoutSession(requests.Session):
+    """A keep-alive session that applies a default (connect, read) timeout."""
+
+    def __init__(self, timeout, pool_size=4):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+try:
+    RAZORPAY_SDK_VERSION = importlib.metadata.version("razorpay")
+except importlib.metadata.PackageNotFoundError:
+    RAZORPAY_SDK_VERSION = ""
+
+
+class RazorpayClient(razorpay.Client):
+    """``razorpay.Client`` that reports its version without pkg_resources.
+
+    Compatibility shim for the razorpay SDK pinned in requirements.txt
+    (1.4.1): its ``_get_version()`` runs ``pkg_resources.require()``, a scan
+    of every installed distribution, on each API call just to build the
+    User-Agent. The override returns the same version, read once at import.
+    An SDK that no longer calls the hook simply ignores it; the test in
+    PaymentGatewayTests shows whether an upgrade still goes through it.
+    """
+
+    def _get_version(self):
+        return RAZORPAY_SDK_VERSION
+
+
+class RazorpayGateway:
+    """Process-wide Razorpay client: one pooled session, timeouts, circuit breaker."""
+
+    name = "razorpay"
+
+    def __init__(self, key_id, key_secret, timeout=(3.05, 10), breaker=None, session=None):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.breaker = breaker or CircuitBreaker()
+        self.client = RazorpayClient(session=session or TimeoutSession(timeout), auth=(key_id, key_secret))
+
+    def _call(self, func, *args):
+        if not self.breaker.allow():
+            raise PaymentGatewayUnavailable("payment gateway circuit is open")
+        try:
+            result = func(*args)
+        except requests.RequestException as exc:
+            self.breaker.record_failure()
+            raise PaymentGatewayUnavailable(str(exc)) from exc
+        except razorpay.errors.BadRequestError as exc:
+            # The gateway answered; the request itself was wrong.
+            self.breaker.record_success()
+            raise PaymentGatewayError(str(exc)) from exc
+        except Exception as exc:
+            self.breaker.record_failure()
+            raise PaymentGatewayError(str(exc)) from exc
+        self.breaker.record_success()
+        return result
+
+    def create_order(self, amount_paise, receipt):
+        return self._call(self.client.order.create, {
+            "amount": amount_paise,
+            "currency": "INR",
+            "receipt": receipt,
+            "payment_capture": 1,
+        })
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        return verify_payment_signature(order_id, payment_id, signature, self.key_secret)
+
+
+class FakeGateway:
+    """In-process stand-in for tests and benchmarks; never touches the network.
+
+    ``latency`` (seconds) simulates a slow gateway; ``fail`` makes every call
+    raise ``PaymentGatewayUnavailable``. Orders are kept in ``orders``.
+    """
+
+    name = "fake"
+
+    def __init__(self, key_id="rzp_test_fake", key_secret="fake_secret", latency=0.0, fail=False, breaker=None):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.latency = latency
+        self.fail = fail
+        self.breaker = breaker or CircuitBreaker()
+        self.orders = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_order(self, amount_paise, receipt):
+        if not self.breaker.allow():
+            raise PaymentGatewayUnavailable("payment gateway circuit is open")
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            self.breaker.record_failure()
+            raise PaymentGatewayUnavailable("fake gateway is failing")
+        self.breaker.record_success()
+        with self._lock:
+            order = {
+                "id": f"order_fake{next(self._ids):010d}",
+                "amount": amount_paise,
+                "currency": "INR",
+                "receipt": receipt,
+                "status": "created",
+            }
+            self.orders[order["id"]] = order
+        return order
+
+    def sign(self, order_id, payment_id):
+        return _hmac_sha256(self.key_secret, f"{order_id}|{payment_id}".encode("utf-8"))
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        return verify_payment_signature(order_id, payment_id, signature, self.key_secret)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def build_gateway():
+    breaker = CircuitBreaker(
+        threshold=settings.PAYMENT_BREAKER_THRESHOLD,
+        reset_timeout=settings.PAYMENT_BREAKER_RESET_TIMEOUT,
+    )
+    if settings.PAYMENT_GATEWAY == "fake":
+        return FakeGateway(key_id=settings.RAZORPAY_KEY_ID or "rzp_test_fake",
+                           key_secret=settings.RAZORPAY_KEY_SECRET or "fake_secret",
+                           breaker=breaker)
+    return RazorpayGateway(
+        settings.RAZORPAY_KEY_ID,
+        settings.RAZORPAY_KEY_SECRET,
+        timeout=(settings.PAYMENT_CONNECT_TIMEOUT, settings.PAYMENT_READ_TIMEOUT),
+        breaker=breaker,
+    )
+
+
+def get_gateway():
+    """The gateway shared by every request in this process."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+@receiver(setting_changed)
+def _reset_gateway(setting, **kwargs):
+    global _gateway
+    if setting.startswith(("PAYMENT_", "RAZORPAY_")):
+        _gateway = None
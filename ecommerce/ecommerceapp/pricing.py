@@ -0,0 +1,84 @@
+import json
+
+from ecommerceapp.models import Product
+from ecommerceapp.orderitems import parse_cart
+
+MAX_CART_LINES = 100
+MAX_LINE_QUANTITY = 99
+
+
+def cart_quantities(items_json):
+    """``{product_id: quantity}`` from the storefront cart JSON.
+
+    Lines whose key is not a product id are reported under ``None``.
+    Quantities are not capped here; see ``price_cart``.
+    """
+    quantities = {}
+    for product_id, _, quantity, _ in parse_cart(items_json)[:MAX_CART_LINES]:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def build_quote(quantities):
+    """Price ``{product_id: quantity}`` against current prices in one query."""
+    ids = [pk for pk in quantities if pk is not None]
+    prices = {
+        pk: (name, selling_price, mrp)
+        for pk, name, selling_price, mrp in Product.objects.filter(id__in=ids).values_list(
+            "id", "product_name", "selling_price", "mrp"
+        )
+    }
+    lines = []
+    unavailable = [pk for pk in ids if pk not in prices]
+    for pk in ids:
+        if pk not in prices:
+            continue
+        name, unit_price, mrp = prices[pk]
+        quantity = quantities[pk]
+        mrp = max(mrp, unit_price)
+        lines.append({
+            "id": pk,
+            "name": name,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "mrp": mrp,
+            "line_total": unit_price * quantity,
+            "line_discount": (mrp - unit_price) * quantity,
+        })
+    total = sum(line["line_total"] for line in lines)
+    discount = sum(line["line_discount"] for line in lines)
+    return {
+        "lines": lines,
+        "unavailable": unavailable,
+        "items": sum(line["quantity"] for line in lines),
+        "subtotal_mrp": total + discount,
+        "discount": discount,
+        "total": total,
+    }
+
+
+def price_cart(items_json):
+    """Price a cart server-side against current prices.
+
+    Not cached: the quote is one primary-key query, and caching it per
+    posted cart would let any client fill the shared cache. Lines with keys
+    that are not product ids are counted as unavailable. Quantities over
+    ``MAX_LINE_QUANTITY`` are priced at the cap and their ids listed under
+    ``over_limit``, so the client can reconcile its cart and checkout can
+    refuse it.
+    """
+    quantities = cart_quantities(items_json)
+    over_limit = [pk for pk, quantity in quantities.items() if pk is not None and quantity > MAX_LINE_QUANTITY]
+    quote = build_quote({pk: min(quantity, MAX_LINE_QUANTITY) for pk, quantity in quantities.items()})
+    quote["over_limit"] = over_limit
+    if None in quantities:
+        quote["unavailable"].append(None)
+    return quote
+
+
+def quote_items_json(quote):
+    """The cart JSON for a quote, in the storefront's ``{id: [qty, name, "₹price"]}`` shape."""
+    return json.dumps(
+        {str(line["id"]): [line["quantity"], line["name"], f"₹{line['unit_price']}"] for line in quote["lines"]},
+        ensure_ascii=False,
+    )
@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils.text import slugify
+
+from ecommerceapp.images import IMAGE_SLOTS, picture_data, product_image
+from ecommerceapp.media import media_url
+from ecommerceapp.models import CatalogCategory, CatalogEntry, Product
+
+REBUILD_BATCH_SIZE = 500
+
+
+def entry_for(product):
+    """Build the (unsaved) read-model row for a product.
+
+    ``product.renditions`` should be prefetched when building many rows.
+    """
+    return CatalogEntry(
+        product=product,
+        product_name=product.product_name,
+        category=product.category,
+        category_slug=slugify(product.category),
+        subcategory=product.subcategory,
+        desc=product.desc,
+        mrp=product.mrp,
+        selling_price=product.selling_price,
+        offer_percentage=product.offer_percentage,
+        image_urls=[media_url(product_image(product, slot)) for slot in IMAGE_SLOTS if product_image(product, slot)],
+        pictures=[picture_data(product, slot) for slot in IMAGE_SLOTS],
+    )
+
+
+def refresh_categories(names):
+    """Recompute the summaries of the given categories from their entries."""
+    for name in names:
+        summary = CatalogEntry.objects.filter(category=name).aggregate(
+            product_count=Count("pk"), first_product_id=Min("pk")
+        )
+        if summary["product_count"]:
+            CatalogCategory.objects.update_or_create(
+                name=name, defaults={"slug": slugify(name), **summary}
+            )
+        else:
+            CatalogCategory.objects.filter(name=name).delete()
+
+
+def refresh_product(product_id, categories=()):
+    """Bring one product's entry, and the categories it touches, up to date.
+
+    Also used after a delete; pass the deleted product's category in
+    ``categories`` since its entry is already gone.
+    """
+    product = Product.objects.prefetch_related("renditions").filter(pk=product_id).first()
+    touched = set(categories)
+    with transaction.atomic():
+        previous = CatalogEntry.objects.filter(pk=product_id).values_list("category", flat=True).first()
+        if previous is not None:
+            touched.add(previous)
+        if product is None:
+            CatalogEntry.objects.filter(pk=product_id).delete()
+        else:
+            entry_for(product).save()
+            touched.add(product.category)
+        refresh_categories(touched)
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Replace the whole read model from ``Product``. Returns the entry count."""
+    total = 0
+    with transaction.atomic():
+        CatalogEntry.objects.all().delete()
+        batch = []
+        products = Product.objects.order_by("id").prefetch_related("renditions")
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(entry_for(product))
+            if len(batch) >= batch_size:
+                CatalogEntry.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        CatalogEntry.objects.bulk_create(batch)
+        total += len(batch)
+
+        CatalogCategory.objects.all().delete()
+        CatalogCategory.objects.bulk_create(
+            CatalogCategory(
+                name=row["category"],
+                slug=row["category_slug"],
+                product_count=row["product_count"],
+                first_product_id=row["first_product_id"],
+            )
+            for row in CatalogEntry.objects.order_by()
+            .values("category", "category_slug")
+            .annotate(product_count=Count("pk"), first_product_id=Min("pk"))
+        )
+    return total
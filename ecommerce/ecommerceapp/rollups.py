@@ -0,0 +1,119 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ecommerceapp.models import DailyOrderStats, DailyStateOrderStats, Orders, RollupWatermark
+
+WATERMARK = "orders"
+PAID_STATUSES = ("Paid", "Delivered")
+PENDING_STATUSES = ("", "Pending")
+# Days before the watermark that are recomputed anyway: payments and
+# deliveries keep changing the status of recent orders after their day ends.
+LOOKBACK_DAYS = 7
+# Days aggregated per query, so a first backfill never groups the whole table.
+BATCH_DAYS = 31
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _orders_between(start, end):
+    return (
+        Orders.objects.filter(created_at__gte=_day_start(start), created_at__lt=_day_start(end + timedelta(days=1)))
+        .annotate(day=TruncDate("created_at"))
+        .order_by()
+    )
+
+
+def _daily_totals(orders):
+    paid = Q(paymentstatus__in=PAID_STATUSES)
+    return orders.values("day").annotate(
+        orders=Count("pk"),
+        revenue=Coalesce(Sum("amount"), 0),
+        paid_orders=Count("pk", filter=paid),
+        paid_revenue=Coalesce(Sum("amount", filter=paid), 0),
+        pending_orders=Count("pk", filter=Q(paymentstatus__in=PENDING_STATUSES)),
+    )
+
+
+def roll_up_days(start, end):
+    """Recompute the rollups for local dates ``start``..``end`` inclusive."""
+    orders = _orders_between(start, end)
+    daily = _daily_totals(orders)
+    state_orders = Counter()
+    state_revenue = Counter()
+    for row in orders.values("day", "state").annotate(orders=Count("pk"), revenue=Coalesce(Sum("amount"), 0)):
+        key = (row["day"], (row["state"] or "").strip()[:100])
+        state_orders[key] += row["orders"]
+        state_revenue[key] += row["revenue"]
+
+    with transaction.atomic():
+        DailyOrderStats.objects.filter(day__range=(start, end)).delete()
+        DailyStateOrderStats.objects.filter(day__range=(start, end)).delete()
+        DailyOrderStats.objects.bulk_create([DailyOrderStats(**row) for row in daily])
+        DailyStateOrderStats.objects.bulk_create(
+            [
+                DailyStateOrderStats(day=day, state=state, orders=total, revenue=state_revenue[(day, state)])
+                for (day, state), total in state_orders.items()
+            ],
+            batch_size=500,
+        )
+
+
+def roll_up(today=None, since=None, lookback=LOOKBACK_DAYS):
+    """Bring the rollups up to date. Returns the ``(start, end)`` days processed.
+
+    Only days after the watermark (less ``lookback`` days) are recomputed,
+    through today; the watermark then moves to yesterday, the last complete
+    day. ``since`` forces a recompute from that day on.
+    """
+    today = today or timezone.localdate()
+    if since is None:
+        watermark = RollupWatermark.objects.filter(name=WATERMARK).values_list("day", flat=True).first()
+        if watermark is not None:
+            since = min(watermark + timedelta(days=1), today) - timedelta(days=lookback)
+        else:
+            first = Orders.objects.aggregate(first=Min("created_at"))["first"]
+            since = timezone.localdate(first) if first else today
+
+    start = since
+    while start <= today:
+        end = min(start + timedelta(days=BATCH_DAYS - 1), today)
+        roll_up_days(start, end)
+        start = end + timedelta(days=1)
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={"day": today - timedelta(days=1)})
+    return since, today
+
+
+def daily_series(start, end):
+    """One row per day in ``start``..``end``, zero-filled. Never writes.
+
+    Days up to the watermark come from the rollups; later ones (just today
+    when rollup_orders ran yesterday) are aggregated live from the orders.
+    """
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).values_list("day", flat=True).first()
+    rolled_until = min(watermark, end) if watermark is not None else start - timedelta(days=1)
+    rows = {}
+    if rolled_until >= start:
+        rows.update(
+            (row["day"], row)
+            for row in DailyOrderStats.objects.filter(day__range=(start, rolled_until)).values(
+                "day", "orders", "revenue", "paid_orders", "paid_revenue", "pending_orders"
+            )
+        )
+    live_start = max(start, rolled_until + timedelta(days=1))
+    if live_start <= end:
+        rows.update((row["day"], row) for row in _daily_totals(_orders_between(live_start, end)))
+
+    empty = {"orders": 0, "revenue": 0, "paid_orders": 0, "paid_revenue": 0, "pending_orders": 0}
+    series = []
+    day = start
+    while day <= end:
+        series.append(rows.get(day) or {"day": day, **empty})
+        day += timedelta(days=1)
+    return series
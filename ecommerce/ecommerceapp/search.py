@@ -0,0 +1,187 @@
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from ecommerceapp.models import Product
+
+logger = logging.getLogger(__name__)
+
+SEARCH_RESULT_LIMIT = 500
+SQLITE_TABLE = "ecommerceapp_product_fts"
+POSTGRES_TABLE = "ecommerceapp_product_search"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _terms(query):
+    return _WORD_RE.findall(query.lower())
+
+
+class IcontainsSearchBackend:
+    """The original ``LIKE '%query%'`` search. Needs no index."""
+
+    name = "icontains"
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        ids = (
+            Product.objects.filter(
+                Q(product_name__icontains=query) |
+                Q(category__icontains=query) |
+                Q(subcategory__icontains=query) |
+                Q(desc__icontains=query)
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        return list(ids[:limit])
+
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteFTSSearchBackend:
+    """SQLite FTS5 index ranked with bm25, product name weighted highest."""
+
+    name = "sqlite-fts5"
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        terms = _terms(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                f"ORDER BY bm25({SQLITE_TABLE}, 10.0, 5.0, 3.0, 1.0) LIMIT %s",
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} "
+                "(rowid, product_name, category, subcategory, description) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [product.pk, product.product_name, product.category, product.subcategory, product.desc],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} "
+                "(rowid, product_name, category, subcategory, description) "
+                'SELECT id, product_name, category, subcategory, "desc" FROM ecommerceapp_product'
+            )
+            return cursor.rowcount
+
+
+class PostgresSearchBackend:
+    """``tsvector`` documents in a GIN-indexed side table, ranked with ts_rank."""
+
+    name = "postgres-tsvector"
+
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('simple', coalesce({name}, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce({category}, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce({subcategory}, '')), 'C') || "
+        "setweight(to_tsvector('simple', coalesce({desc}, '')), 'D')"
+    )
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        terms = _terms(query)
+        if not terms:
+            return []
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {POSTGRES_TABLE}, to_tsquery('simple', %s) AS q "
+                "WHERE document @@ q ORDER BY ts_rank(document, q) DESC, product_id LIMIT %s",
+                [tsquery, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_product(self, product):
+        document = self.DOCUMENT_SQL.format(name="%s", category="%s", subcategory="%s", desc="%s")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, {document}) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                [product.pk, product.product_name, product.category, product.subcategory, product.desc],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE product_id = %s", [product_id])
+
+    def rebuild(self):
+        document = self.DOCUMENT_SQL.format(
+            name="product_name", category="category", subcategory="subcategory", desc='"desc"'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) "
+                f"SELECT id, {document} FROM ecommerceapp_product"
+            )
+            return cursor.rowcount
+
+
+BACKENDS = {
+    "sqlite": SQLiteFTSSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """Pick the backend from ``CATALOG_SEARCH_BACKEND``.
+
+    ``auto`` uses the full-text index of the current database vendor,
+    ``icontains`` forces the original substring search.
+    """
+    choice = getattr(settings, "CATALOG_SEARCH_BACKEND", "auto")
+    if choice == "icontains":
+        return IcontainsSearchBackend()
+    backend_class = BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        return IcontainsSearchBackend()
+    return backend_class()
+
+
+def search_products(query, limit=SEARCH_RESULT_LIMIT):
+    """Return product ids matching ``query``, best match first.
+
+    The full-text backends match words, not substrings: every word of the
+    query must start a word of the product ("neem so" finds "Neem Soap",
+    "eem" finds nothing). The icontains fallback still matches the whole
+    query as one substring.
+    """
+    backend = get_search_backend()
+    try:
+        return backend.search(query, limit)
+    except DatabaseError:
+        logger.exception("%s search failed, falling back to icontains", backend.name)
+        return IcontainsSearchBackend().search(query, limit)
+
+
+def index_product(product):
+    get_search_backend().index_product(product)
+
+
+def remove_product(product_id):
+    get_search_backend().remove_product(product_id)
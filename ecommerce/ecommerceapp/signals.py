@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ecommerceapp import metrics, readmodel, search, suggest
+from ecommerceapp.catalog import bump_catalog_version
+from ecommerceapp.models import CarouselAd, Contact, DashboardMetric, Orders, Product, ShopCategory
+
+
+@receiver(post_save, sender=CarouselAd)
+@receiver(post_delete, sender=CarouselAd)
+@receiver(post_save, sender=ShopCategory)
+@receiver(post_delete, sender=ShopCategory)
+def invalidate_catalog(sender, **kwargs):
+    # Bump only after commit so a concurrent rebuild cannot cache rows that
+    # were not yet visible under the new version.
+    transaction.on_commit(_bump_catalog_version)
+
+
+def _bump_catalog_version():
+    suggest.index.catalog_bumped(bump_catalog_version())
+
+
+# Like the version bump, index writes wait for the commit so a rolled-back
+# save never leaves a search row for a product that does not exist.
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.index_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search.remove_product(pk))
+
+
+@receiver(post_save, sender=ShopCategory)
+def update_category_suggestions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: suggest.index.update_category(instance))
+
+
+@receiver(post_delete, sender=ShopCategory)
+def remove_category_suggestions(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: suggest.index.remove_category(pk))
+
+
+# Product writes refresh everything derived from the product in order,
+# and bump the catalog version last so no worker caches a page built
+# from a stale read model under the new version. Image renditions are
+# left to backfill_renditions (Product.renditions_pending); until then
+# the read model points at the original upload.
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    def refresh():
+        readmodel.refresh_product(instance.pk)
+        suggest.index.update_product(instance)
+        _bump_catalog_version()
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    category = instance.category
+
+    def refresh():
+        readmodel.refresh_product(pk, categories=[category])
+        suggest.index.remove_product(pk)
+        _bump_catalog_version()
+
+    transaction.on_commit(refresh)
+
+
+# Dashboard counters move with each write, in the writer's transaction.
+# Saves that leave every tracked field alone (update_fields) are skipped.
+def _affects_metrics(sender, update_fields):
+    return update_fields is None or bool(set(metrics.TRACKED_FIELDS[sender]) & set(update_fields))
+
+
+@receiver(pre_save, sender=Orders)
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Contact)
+@receiver(pre_save, sender=CarouselAd)
+def remember_metric_values(sender, instance, update_fields=None, **kwargs):
+    if not _affects_metrics(sender, update_fields):
+        return
+    instance._metric_values = None if instance._state.adding else metrics.stored_values(sender, instance.pk)
+
+
+@receiver(post_save, sender=Orders)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Contact)
+@receiver(post_save, sender=CarouselAd)
+def update_metrics_on_save(sender, instance, update_fields=None, **kwargs):
+    if not _affects_metrics(sender, update_fields):
+        return
+    old = metrics.contributions(sender, getattr(instance, "_metric_values", None))
+    new = metrics.contributions(sender, metrics.tracked_values(instance))
+    DashboardMetric.objects.adjust(metrics.difference(old, new))
+
+
+@receiver(post_delete, sender=Orders)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Contact)
+@receiver(post_delete, sender=CarouselAd)
+def update_metrics_on_delete(sender, instance, **kwargs):
+    old = metrics.contributions(sender, metrics.tracked_values(instance))
+    DashboardMetric.objects.adjust(metrics.difference(old, {}))
@@ -0,0 +1,218 @@
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.utils.text import slugify
+
+from ecommerceapp.catalog import get_catalog_last_modified, get_catalog_version
+from ecommerceapp.models import CatalogEntry, ShopCategory
+
+logger = logging.getLogger(__name__)
+
+MAX_PRODUCT_SUGGESTIONS = 50
+MAX_CATEGORY_SUGGESTIONS = 10
+# Other workers learn about catalog writes through the shared catalog
+# version; checking it at most this often keeps lookups off the cache/DB.
+VERSION_CHECK_INTERVAL = 5
+NGRAM_SIZE = 3
+
+
+def _ngrams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NgramPostings:
+    """Substring lookup over short labels.
+
+    Every 1..3-gram of a label points at the entries containing it, so a
+    query of up to three characters is a single postings lookup and longer
+    queries intersect their trigram postings before a final substring check.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.postings = defaultdict(set)
+
+    def add(self, key, sort_key, label, payload):
+        self.remove(key)
+        folded = label.casefold()
+        self.entries[key] = (sort_key, folded, payload)
+        for size in range(1, NGRAM_SIZE + 1):
+            for gram in _ngrams(folded, size):
+                self.postings[gram].add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        folded = entry[1]
+        for size in range(1, NGRAM_SIZE + 1):
+            for gram in _ngrams(folded, size):
+                keys = self.postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[gram]
+
+    def search(self, query, limit):
+        if not query:
+            candidates = self.entries.keys()
+        elif len(query) <= NGRAM_SIZE:
+            candidates = self.postings.get(query, ())
+        else:
+            grams = sorted(_ngrams(query, NGRAM_SIZE), key=lambda g: len(self.postings.get(g, ())))
+            candidates = set(self.postings.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= self.postings.get(gram, set())
+            candidates = [key for key in candidates if query in self.entries[key][1]]
+        best = heapq.nsmallest(limit, candidates, key=lambda key: self.entries[key][0])
+        return [self.entries[key][2] for key in best]
+
+
+class SuggestionIndex:
+    """Per-process autocomplete index over product names and active shop categories."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._products = NgramPostings()
+            self._categories = NgramPostings()
+            self._version = None
+            self._modified = None
+            self._checked_at = 0.0
+            self.stats = {
+                "rebuilds": 0,
+                "last_rebuild_ms": 0.0,
+                "updates": 0,
+                "queries": 0,
+                "last_query_ms": 0.0,
+                "max_query_ms": 0.0,
+                "total_query_ms": 0.0,
+            }
+
+    # ------------------------------
+    # Building
+    # ------------------------------
+    def rebuild(self):
+        started = time.perf_counter()
+        version = get_catalog_version()
+        modified = get_catalog_last_modified()
+        products = NgramPostings()
+        for pk, name in CatalogEntry.objects.values_list("pk", "product_name"):
+            products.add(pk, pk, name, self._product_payload(pk, name))
+        categories = NgramPostings()
+        for pk, name, order in ShopCategory.objects.filter(is_active=True).values_list(
+            "id", "section_name", "display_order"
+        ):
+            categories.add(pk, (order, pk), name, self._category_payload(name))
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._products = products
+            self._categories = categories
+            self._version = version
+            self._modified = modified
+            self._checked_at = time.monotonic()
+            self.stats["rebuilds"] += 1
+            self.stats["last_rebuild_ms"] = round(elapsed, 3)
+        logger.info("suggestion index rebuilt: %d products, %d categories in %.1f ms",
+                    len(products.entries), len(categories.entries), elapsed)
+
+    def _ensure_current(self):
+        if self._version is None:
+            self.rebuild()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if get_catalog_version() != self._version:
+            self.rebuild()
+
+    def current_state(self):
+        """Catalog version and modification time the index answers for."""
+        self._ensure_current()
+        return self._version, self._modified
+
+    @staticmethod
+    def _product_payload(pk, name):
+        return {"type": "product", "label": name, "id": pk}
+
+    @staticmethod
+    def _category_payload(name):
+        return {"type": "category", "label": name, "slug": slugify(name)}
+
+    # ------------------------------
+    # Incremental updates (called after commit)
+    # ------------------------------
+    def catalog_bumped(self, version):
+        # Our own write moved the version by one: the incremental update
+        # covers it, so no full rebuild is needed in this process.
+        with self._lock:
+            if self._version is not None and self._version == version - 1:
+                self._version = version
+                self._modified = get_catalog_last_modified()
+
+    def update_product(self, product):
+        with self._lock:
+            self._products.add(product.pk, product.pk, product.product_name,
+                               self._product_payload(product.pk, product.product_name))
+            self.stats["updates"] += 1
+
+    def remove_product(self, pk):
+        with self._lock:
+            self._products.remove(pk)
+            self.stats["updates"] += 1
+
+    def update_category(self, category):
+        with self._lock:
+            if category.is_active:
+                self._categories.add(category.pk, (category.display_order, category.pk),
+                                     category.section_name, self._category_payload(category.section_name))
+            else:
+                self._categories.remove(category.pk)
+            self.stats["updates"] += 1
+
+    def remove_category(self, pk):
+        with self._lock:
+            self._categories.remove(pk)
+            self.stats["updates"] += 1
+
+    # ------------------------------
+    # Lookup
+    # ------------------------------
+    def suggest(self, query):
+        self._ensure_current()
+        started = time.perf_counter()
+        folded = query.casefold()
+        with self._lock:
+            suggestions = (
+                self._products.search(folded, MAX_PRODUCT_SUGGESTIONS)
+                + self._categories.search(folded, MAX_CATEGORY_SUGGESTIONS)
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stats["queries"] += 1
+            self.stats["last_query_ms"] = round(elapsed, 3)
+            self.stats["max_query_ms"] = round(max(self.stats["max_query_ms"], elapsed), 3)
+            self.stats["total_query_ms"] += elapsed
+        return suggestions, elapsed
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["products"] = len(self._products.entries)
+            stats["categories"] = len(self._categories.entries)
+            stats["version"] = self._version
+        queries = stats["queries"]
+        stats["avg_query_ms"] = round(stats.pop("total_query_ms") / queries, 3) if queries else 0.0
+        return stats
+
+
+index = SuggestionIndex()
@@ -0,0 +1,60 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ecommerceapp.images import IMAGE_SLOTS, picture_data
+from ecommerceapp.media import media_url as resolve_media_url
+from ecommerceapp.models import CatalogEntry
+
+register = template.Library()
+
+
+@register.filter
+def media_url(value):
+    """``{{ ad.image|media_url }}`` - like ``.url`` but memoized per storage name."""
+    return resolve_media_url(value)
+
+
+def _picture(product, slot):
+    if isinstance(product, CatalogEntry):
+        return product.picture(slot)
+    return picture_data(product, slot)
+
+
+@register.simple_tag
+def product_picture(product, slot=None, css_class="", sizes="100vw", alt=None):
+    """Render a product image as a responsive <picture>.
+
+    ``product`` is a ``Product`` or its ``CatalogEntry``. ``slot`` picks
+    image1..image3; by default the first image the product has is used.
+    WebP renditions are offered first with JPEG as fallback, and
+    width/height come from the renditions to reserve layout space.
+    Products without renditions fall back to the original upload, and
+    products without images to the placeholder.
+    """
+    alt = product.product_name if alt is None else alt
+    slots = [slot] if slot else IMAGE_SLOTS
+    picture = next((p for p in (_picture(product, s) for s in slots) if p), None)
+    if picture is None:
+        return format_html('<img src="{}" class="{}" alt="{}">', static("images/image.png"), css_class, alt)
+
+    if not picture["srcset"]:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', picture["src"], css_class, alt)
+
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset, sizes) for mime, srcset in picture["sources"]),
+    )
+    return format_html(
+        '<picture style="display: contents">{}<img src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" class="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+        sources,
+        picture["src"],
+        picture["srcset"],
+        sizes,
+        picture["width"],
+        picture["height"],
+        css_class,
+        alt,
+    )
@@ -1,3 +1,1207 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, close_old_connections, connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.db.models.query import QuerySet
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from ecommerceapp import dashboard, metrics, paymentevents, payments, readmodel, rollups, search, suggest, views
+from ecommerceapp.admin import ContactAdmin, OrdersAdmin
+from ecommerceapp.catalog import (
+    SEARCH_QUERY_MAX_LENGTH,
+    get_catalog_version,
+    group_products_by_category,
+    normalize_query,
+)
+from ecommerceapp.media import MediaURLCache
+from ecommerceapp.models import (
+    CarouselAd,
+    CatalogCategory,
+    CatalogEntry,
+    Contact,
+    DailyOrderStats,
+    DailyStateOrderStats,
+    DashboardMetric,
+    OrderItem,
+    OrderUpdate,
+    Orders,
+    PaymentEvent,
+    Product,
+    ProductImageRendition,
+    ShopCategory,
+)
+from ecommerceapp.orderitems import sales_by_product
+from ecommerceapp.pricing import price_cart
+
+
+def make_products(categories, per_category):
+    Product.objects.bulk_create(
+        Product(
+            product_name=f"{category} item {n}",
+            category=category,
+            desc="Herbal care",
+            mrp=200,
+            selling_price=150,
+        )
+        for category in categories
+        for n in range(per_category)
+    )
+    # bulk_create sends no signals, so refresh the read model by hand.
+    readmodel.rebuild()
+
+
+class CatalogGroupingTests(TestCase):
+    def test_groups_into_slides_of_four(self):
+        make_products(["Soap", "Hair Oil"], 5)
+
+        with self.assertNumQueries(1):
+            allProds, anchors = group_products_by_category(Product.objects.order_by("id"))
+
+        self.assertEqual([section[0][0].category for section in allProds], ["Soap", "Hair Oil"])
+        products, slides, nSlides, next_url = allProds[0]
+        self.assertEqual(len(products), 5)
+        self.assertEqual(list(slides), [1, 2])
+        self.assertEqual(nSlides, 2)
+        self.assertIsNone(next_url)
+        self.assertEqual(anchors["hair-oil"], "category-hair-oil")
+
+    def test_query_count_is_independent_of_category_count(self):
+        make_products([f"Category {n}" for n in range(3)], 2)
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/")
+
+        make_products([f"Category {n}" for n in range(3, 300)], 2)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/")
+
+        self.assertContains(response, 'id="category-category-299"')
+        self.assertEqual(len(few), len(many))
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_requests_reuse_rendered_sections(self):
+        make_products(["Soap"], 2)
+        self.client.get("/")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/")
+
+        self.assertContains(response, "Soap item 1")
+        self.assertFalse(any("ecommerceapp_product" in q["sql"] for q in queries))
+
+    def test_search_pages_are_not_cached(self):
+        make_products(["Soap"], 2)
+        search.get_search_backend().rebuild()
+        with mock.patch.object(cache, "set") as cache_set:
+            for n in range(2):
+                self.assertContains(self.client.get("/", {"query": f"soap item {n}"}), f"Soap item {n}")
+            self.assertContains(self.client.get("/", {"query": "  soap  " * 100 + "nothing"}), "Soap item 1")
+        cache_set.assert_not_called()
+
+    def test_search_query_is_normalized_and_capped(self):
+        self.assertEqual(normalize_query("  neem \t  soap "), "neem soap")
+        self.assertEqual(len(normalize_query("a" * 500)), SEARCH_QUERY_MAX_LENGTH)
+        self.assertEqual(normalize_query(None), "")
+
+    def test_product_save_invalidates_after_commit(self):
+        make_products(["Soap"], 1)
+        self.client.get("/")
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(product_name="Neem Comb", category="Soap", desc="Wooden")
+
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertContains(self.client.get("/"), "Neem Comb")
+
+
+class CatalogSectionApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_homepage_renders_first_slide_only(self):
+        make_products(["Soap"], 10)
+
+        response = self.client.get("/")
+
+        self.assertContains(response, "Soap item 3")
+        self.assertNotContains(response, "Soap item 4")
+        self.assertContains(response, 'data-next-url="/api/catalog/soap/?after=')
+
+    def test_keyset_pages_walk_the_whole_section(self):
+        make_products(["Soap", "Hair Oil"], 10)
+        names = []
+        url = "/api/catalog/soap/?limit=4"
+        while url:
+            page = self.client.get(url).json()
+            names += [item["product_name"] for item in page["results"]]
+            url = page["next"]
+
+        self.assertEqual(names, [f"Soap item {n}" for n in range(10)])
+
+    def test_only_server_issued_cursors_are_cached(self):
+        make_products(["Soap"], 30)
+        first = self.client.get("/api/catalog/soap/").json()
+        with mock.patch.object(cache, "set") as cache_set:
+            for params in ({"after": 10 ** 9}, {"after": -3}, {"after": 0, "limit": 5}):
+                self.assertEqual(self.client.get("/api/catalog/soap/", params).status_code, 200)
+            foreign = Product.objects.create(product_name="Neem Oil", category="Oil", desc="-")
+            self.client.get("/api/catalog/soap/", {"after": foreign.pk})
+        cache_set.assert_not_called()
+
+        with mock.patch.object(cache, "set") as cache_set:
+            second = self.client.get(first["next"]).json()
+        self.assertEqual(cache_set.call_count, 1)
+        self.assertEqual(
+            [item["product_name"] for item in second["results"]], [f"Soap item {n}" for n in range(12, 24)]
+        )
+
+    def test_unknown_category_is_404(self):
+        self.assertEqual(self.client.get("/api/catalog/nothing/").status_code, 404)
+
+
+class SearchTests(TestCase):
+    def make(self, name, desc="Herbal care", category="Soap"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(product_name=name, category=category, desc=desc)
+
+    def test_name_matches_rank_above_description_matches(self):
+        in_desc = self.make("Herbal Bar", desc="Made with neem")
+        in_name = self.make("Neem Comb")
+        self.assertEqual(search.search_products("neem"), [in_name.pk, in_desc.pk])
+
+    def test_every_word_must_prefix_a_product_word(self):
+        soap = self.make("Neem Soap")
+        self.make("Neem Oil", category="Oil")
+        self.assertEqual(search.search_products("neem so"), [soap.pk])
+        self.assertEqual(search.search_products("SOAP, neem!"), [soap.pk])
+        self.assertEqual(search.search_products("eem"), [])
+
+    def test_index_follows_committed_saves_and_deletes(self):
+        soap = self.make("Neem Soap")
+        with self.captureOnCommitCallbacks(execute=True):
+            soap.product_name = "Aloe Soap"
+            soap.save()
+        self.assertEqual(search.search_products("aloe"), [soap.pk])
+        self.assertEqual(search.search_products("neem"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            soap.delete()
+        self.assertEqual(search.search_products("aloe"), [])
+
+    def test_rolled_back_save_is_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Product.objects.create(product_name="Ghost Soap", category="Soap", desc="-")
+                    raise DatabaseError("rolled back")
+            except DatabaseError:
+                pass
+        self.assertEqual(search.search_products("ghost"), [])
+
+    def test_falls_back_to_icontains(self):
+        soap = self.make("Neem Soap")
+        with (
+            mock.patch.object(search.SQLiteFTSSearchBackend, "search", side_effect=OperationalError("no fts5")),
+            self.assertLogs("ecommerceapp.search", "ERROR"),
+        ):
+            self.assertEqual(search.search_products("eem so"), [soap.pk])
+        with override_settings(CATALOG_SEARCH_BACKEND="icontains"):
+            self.assertEqual(search.search_products("eem"), [soap.pk])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        suggest.index.reset()
+
+    def test_substring_suggestions_without_queries(self):
+        make_products(["Soap", "Hair Oil"], 3)
+        ShopCategory.objects.create(section_name="Hair Oil", image="x.jpg")
+        self.client.get("/autocomplete/")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/autocomplete/", {"q": "IR OI"})
+
+        labels = [item["label"] for item in response.json()]
+        self.assertEqual(labels, ["Hair Oil item 0", "Hair Oil item 1", "Hair Oil item 2", "Hair Oil"])
+        self.assertIn("suggest;dur=", response["Server-Timing"])
+
+    def test_signals_update_the_index_incrementally(self):
+        self.client.get("/autocomplete/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(product_name="Kumkumadi Tailam", category="Oil", desc="Night")
+            ShopCategory.objects.create(section_name="Oils", image="x.jpg", is_active=False)
+
+        with self.assertNumQueries(0):
+            labels = [item["label"] for item in self.client.get("/autocomplete/", {"q": "oil"}).json()]
+        self.assertEqual(labels, [])
+        self.assertEqual(self.client.get("/autocomplete/", {"q": "kumku"}).json()[0]["id"], product.id)
+        self.assertEqual(suggest.index.snapshot()["rebuilds"], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        suggest.index.reset()
+        make_products(["Soap"], 2)
+
+    def assert_revalidates(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with CaptureQueriesContext(connection) as queries:
+            repeat = self.client.get(url, params, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(repeat.status_code, 304)
+        self.assertFalse(any("ecommerceapp_" in q["sql"] for q in queries))
+        return response
+
+    def test_homepage_autocomplete_and_sections_return_304(self):
+        self.assert_revalidates("/", query="soap")
+        self.assert_revalidates("/autocomplete/", q="so")
+        self.assert_revalidates("/api/catalog/soap/", after=0)
+
+    def test_catalog_write_changes_the_etag(self):
+        etag = self.client.get("/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(product_name="Neem Comb", category="Soap", desc="Wooden")
+
+        response = self.client.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_signed_in_homepage_has_no_validators(self):
+        self.client.force_login(User.objects.create_user("shopper", "s@example.com", "pw"))
+        self.assertFalse(self.client.get("/").has_header("ETag"))
+
+
+def make_upload(name, size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (74, 93, 78)).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(DEFAULT_FILE_STORAGE="django.core.files.storage.InMemoryStorage")
+class ProductImageTests(TestCase):
+    def make(self, size=(1200, 800)):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                product_name="Neem Soap", category="Soap", desc="-", image1=make_upload("neem.png", size)
+            )
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command("backfill_renditions", *args, stdout=out)
+        return out.getvalue()
+
+    def render(self, product):
+        return Template("{% load product_images %}{% product_picture product %}").render(Context({"product": product}))
+
+    def test_save_defers_renditions_to_the_backfill(self):
+        product = self.make()
+        self.assertTrue(product.renditions_pending)
+        self.assertFalse(ProductImageRendition.objects.exists())
+        # Until then pages show the original upload.
+        html = self.render(CatalogEntry.objects.get(pk=product.pk))
+        self.assertIn(f'src="/media/{product.image1.name}"', html)
+        self.assertNotIn("srcset", html)
+
+        self.assertIn("wrote 6 renditions", self.backfill())
+        self.assertEqual(
+            list(ProductImageRendition.objects.values_list("format", "width", "height")),
+            [("jpeg", 320, 213), ("jpeg", 640, 427), ("jpeg", 960, 640),
+             ("webp", 320, 213), ("webp", 640, 427), ("webp", 960, 640)],
+        )
+        product.refresh_from_db()
+        self.assertFalse(product.renditions_pending)
+        self.assertIn("checked 0 products", self.backfill())
+
+        html = self.render(CatalogEntry.objects.get(pk=product.pk))
+        self.assertIn('<source type="image/webp" srcset="/media/images/renditions/neem', html)
+        self.assertRegex(html, r'srcset="[^"]*_320w\.jpeg 320w, [^"]*_640w\.jpeg 640w, [^"]*_960w\.jpeg 960w"')
+        self.assertIn('width="960" height="640"', html)
+
+    def test_small_upload_gets_one_rendition_at_its_own_size(self):
+        self.make(size=(200, 100))
+        self.backfill()
+        self.assertEqual(
+            list(ProductImageRendition.objects.values_list("format", "width", "height")),
+            [("jpeg", 200, 100), ("webp", 200, 100)],
+        )
+
+    def test_full_save_without_image_changes_leaves_renditions_alone(self):
+        self.make()
+        self.backfill()
+        product = Product.objects.get()
+        product.selling_price = 120
+        product.save()
+        product.refresh_from_db()
+        self.assertFalse(product.renditions_pending)
+
+        product.image2 = make_upload("aloe.png", (640, 640))
+        product.save()
+        product.refresh_from_db()
+        self.assertTrue(product.renditions_pending)
+
+    def test_only_image_changes_mark_the_product_pending(self):
+        product = self.make()
+        self.backfill()
+        product.selling_price = 120
+        product.save(update_fields=["selling_price"])
+        product.refresh_from_db()
+        self.assertFalse(product.renditions_pending)
+
+        product.image1 = make_upload("aloe.png", (640, 640))
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save(update_fields=["image1"])
+        self.backfill()
+        self.assertEqual(set(ProductImageRendition.objects.values_list("source_name", flat=True)), {product.image1.name})
+        self.assertIn("_640w.jpeg 640w", self.render(CatalogEntry.objects.get(pk=product.pk)))
+
+    def test_force_rebuilds_every_product(self):
+        self.make()
+        self.backfill()
+        self.assertIn("checked 1 products, wrote 6 renditions", self.backfill("--force"))
+
+    def test_product_without_images_uses_the_placeholder(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(product_name="Neem Comb", category="Soap", desc="-")
+        self.assertRegex(self.render(product), r'^<img src="/static/images/image[.\w]*\.png" class="" alt="Neem Comb">$')
+
+
+class CatalogReadModelTests(TestCase):
+    def test_product_writes_keep_entries_and_summaries_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                product_name="Neem Soap", category="Bath Soap", desc="Herbal", mrp=200, selling_price=150
+            )
+        entry = CatalogEntry.objects.get(pk=product.pk)
+        self.assertEqual((entry.category_slug, entry.offer_percentage), ("bath-soap", 25))
+        self.assertEqual(CatalogCategory.objects.get(slug="bath-soap").product_count, 1)
+
+        product.category = "Hair Oil"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(list(CatalogCategory.objects.values_list("name", "product_count")), [("Hair Oil", 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertFalse(CatalogEntry.objects.exists())
+        self.assertFalse(CatalogCategory.objects.exists())
+
+
+class QueryPlanTests(TestCase):
+    """Hot lookups must be served by an index, never a full table scan.
+
+    Runs against whichever database the suite uses; point DATABASE_URL at
+    PostgreSQL to check its plans as well.
+    """
+
+    # SQLite: "SCAN table" without USING INDEX. PostgreSQL: "Seq Scan on".
+    FULL_SCAN = re.compile(r"\bSCAN (?!.*USING (COVERING )?INDEX)\S+|Seq Scan on")
+
+    @classmethod
+    def setUpTestData(cls):
+        make_products(["Soap", "Hair Oil", "Face Pack"], 20)
+        ShopCategory.objects.bulk_create(
+            ShopCategory(section_name=f"Section {n}", image="x.png", is_active=n % 2 == 0, display_order=n)
+            for n in range(20)
+        )
+        Orders.objects.bulk_create(
+            Orders(
+                items_json="{}",
+                name="Buyer",
+                email=f"buyer{n % 10}@example.com",
+                address1="-",
+                address2="-",
+                city="-",
+                state="-",
+                zip_code="-",
+                razorpay_order_id=f"order_{n}" if n % 3 else None,
+                created_at=timezone.now() - timedelta(days=n),
+            )
+            for n in range(200)
+        )
+        OrderUpdate.objects.bulk_create(
+            OrderUpdate(order_id=order_id, update_desc="Order placed")
+            for order_id in Orders.objects.values_list("order_id", flat=True)
+        )
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # The seeded tables are tiny; make the planner show what it
+            # would do once they are not.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assert_indexed(self, queryset):
+        plan = queryset.explain()
+        self.assertIsNone(self.FULL_SCAN.search(plan), f"full scan in plan:\n{plan}")
+
+    def test_profile_orders_by_email(self):
+        self.assert_indexed(Orders.objects.filter(email="buyer1@example.com").order_by("-order_id"))
+
+    def test_payment_success_by_gateway_order_id(self):
+        self.assert_indexed(Orders.objects.filter(razorpay_order_id="order_1"))
+
+    def test_order_updates_by_order(self):
+        self.assert_indexed(OrderUpdate.objects.filter(order_id=5))
+        self.assert_indexed(OrderUpdate.objects.filter(order_id__in=[1, 2, 3], delivered=True))
+
+    def test_dashboard_orders_per_day(self):
+        self.assert_indexed(
+            Orders.objects.filter(created_at__gte=timezone.now() - timedelta(days=30))
+            .annotate(order_date=TruncDate("created_at"))
+            .values("order_date")
+            .annotate(total=Count("order_id"))
+        )
+        today = timezone.localdate()
+        self.assert_indexed(DailyOrderStats.objects.filter(day__range=(today - timedelta(days=89), today)))
+
+    def test_dashboard_contact_domains(self):
+        self.assert_indexed(
+            Contact.objects.exclude(email_domain="").values_list("email_domain").annotate(total=Count("id"))
+        )
+        self.assert_indexed(Contact.objects.filter(email_domain="gmail.com"))
+
+    def test_products_by_category(self):
+        self.assert_indexed(Product.objects.filter(category="Soap", id__gt=3).order_by("id"))
+        self.assert_indexed(CatalogEntry.objects.filter(category_slug="soap", pk__gt=3).order_by("pk"))
+
+    def test_active_shop_categories(self):
+        self.assert_indexed(ShopCategory.objects.filter(is_active=True).order_by("display_order", "id"))
+
+
+def make_order(items, **fields):
+    defaults = dict(name="Buyer", email="buyer@example.com", address1="-", address2="-", city="-", state="-", zip_code="-")
+    defaults.update(fields)
+    return Orders.objects.create(items_json=json.dumps(items), **defaults)
+
+
+class OrderItemTests(TestCase):
+    def setUp(self):
+        self.soap = Product.objects.create(product_name="Neem Soap", category="Soap", desc="-", selling_price=150)
+        self.oil = Product.objects.create(product_name="Hair Oil", category="Oil", desc="-", selling_price=300)
+
+    @override_settings(PAYMENT_GATEWAY="fake")
+    def test_checkout_writes_order_items(self):
+        self.client.force_login(User.objects.create_user("shopper", "s@example.com", "pw"))
+        cart = {str(self.soap.id): [2, "Neem Soap", "₹150"], str(self.oil.id): [1, "Hair Oil", "₹300"]}
+
+        self.client.post("/checkout/", {"itemsJson": json.dumps(cart), "amt": "600", "name": "Buyer"})
+
+        order = Orders.objects.get()
+        self.assertEqual(
+            list(order.items.values_list("product_id", "quantity", "unit_price")),
+            [(self.soap.id, 2, 150), (self.oil.id, 1, 300)],
+        )
+        self.assertEqual(order.get_products_summary(), "2x- Neem Soap, 1x- Hair Oil")
+
+    def test_backfill_and_sales_by_product(self):
+        make_order({str(self.soap.id): [2, "Neem Soap", "₹150"], "999": [1, "Gone", "₹10"]})
+        make_order({str(self.soap.id): [1, "Neem Soap", "₹150"], str(self.oil.id): [3, "Hair Oil", "₹300"]})
+        make_order("not json")
+
+        call_command("backfill_order_items", batch_size=2, stdout=io.StringIO())
+        call_command("backfill_order_items", stdout=io.StringIO())  # idempotent
+
+        self.assertEqual(OrderItem.objects.count(), 4)
+        self.assertIsNone(OrderItem.objects.get(product_name="Gone").product_id)
+        with self.assertNumQueries(1):
+            sales = list(sales_by_product())
+        self.assertEqual(
+            [(row["product_id"], row["units"], row["revenue"], row["orders"]) for row in sales],
+            [(self.soap.id, 3, 450, 2), (self.oil.id, 3, 900, 1)],
+        )
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        chart = self.client.get("/api/admin-dashboard/top_products/").json()
+        self.assertEqual((chart["labels"], chart["values"]), (["Neem Soap", "Hair Oil"], [3, 3]))
+
+
+class ProductsSummaryTests(TestCase):
+    def test_summary_is_stored_on_save_and_searchable_without_parsing(self):
+        order = make_order({"1": [2, "Neem Soap", "₹150"], "2": [1, "Hair Oil", "₹300"]})
+        self.assertEqual(order.products_summary, "2x- Neem Soap, 1x- Hair Oil")
+
+        order.items_json = json.dumps({"1": [3, "Neem Soap", "₹150"]})
+        order.save(update_fields=["items_json"])
+        order.refresh_from_db()
+        self.assertEqual(order.products_summary, "3x- Neem Soap")
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        with mock.patch("ecommerceapp.models.summarize_items_json") as summarize:
+            response = self.client.get("/admin/ecommerceapp/orders/", {"q": "neem soap"})
+        summarize.assert_not_called()
+        self.assertContains(response, "3x- Neem Soap")
+
+    def test_recompute_fills_rows_saved_without_a_summary(self):
+        order = make_order({"1": [1, "Aloe Gel", "₹99"]})
+        Orders.objects.filter(pk=order.pk).update(products_summary="")
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        self.assertContains(self.client.get("/admin/ecommerceapp/orders/"), "1x- Aloe Gel")
+
+        call_command("recompute_products_summary", stdout=io.StringIO())
+
+        order.refresh_from_db()
+        self.assertEqual(order.products_summary, "1x- Aloe Gel")
+
+
+class OrderStatusTests(TestCase):
+    def test_updates_maintain_the_stored_status(self):
+        order = make_order({"1": [1, "Neem Soap", "₹150"]}, paymentstatus="Paid", amountpaid="150")
+        self.assertIsNotNone(order.expected_delivery)
+
+        delivered = OrderUpdate.objects.create(order_id=order.order_id, update_desc="Delivered", delivered=True)
+        order.refresh_from_db()
+        self.assertEqual((order.paymentstatus, order.is_delivered, order.is_cancelled), ("Delivered", True, False))
+        delivered_at = order.delivered_at
+
+        OrderUpdate.objects.create(order_id=order.order_id, update_desc="Also delivered", delivered=True)
+        order.refresh_from_db()
+        self.assertEqual(order.delivered_at, delivered_at)
+
+        delivered.delivered = False
+        delivered.save()
+        order.refresh_from_db()
+        self.assertEqual(order.paymentstatus, "Delivered")
+
+        OrderUpdate.objects.filter(order_id=order.order_id, delivered=True).get().delete()
+        order.refresh_from_db()
+        self.assertEqual((order.paymentstatus, order.delivered_at), ("Paid", None))
+
+        OrderUpdate.objects.create(order_id=order.order_id, update_desc="Cancelled", cancelled=True)
+        order.refresh_from_db()
+        self.assertEqual((order.paymentstatus_display, order.is_cancelled), ("Cancelled", True))
+
+    def test_admin_save_is_one_update(self):
+        order = make_order({"1": [1, "Neem Soap", "₹150"]})
+        update = OrderUpdate.objects.create(order_id=order.order_id, update_desc="Shipped")
+        update.delivered = True
+        with CaptureQueriesContext(connection) as queries:
+            update.save()
+        order_writes = [q["sql"] for q in queries.captured_queries if q["sql"].startswith('UPDATE "ecommerceapp_orders"')]
+        self.assertEqual(len(order_writes), 1)
+
+    def test_bulk_admin_actions_use_a_fixed_number_of_queries(self):
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        orders = [make_order({"1": [1, "Neem Soap", "₹150"]}, paymentstatus="Paid", amountpaid="150") for _ in range(40)]
+        cancelled = orders[0]
+        OrderUpdate.objects.create(order_id=cancelled.order_id, update_desc="Cancelled", cancelled=True)
+        selected = [str(order.order_id) for order in orders]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/admin/ecommerceapp/orders/", {"action": "mark_delivered", "_selected_action": selected})
+        # The changelist's own counts plus select, insert, update and count,
+        # and the status counts before and after the update for the metrics.
+        order_queries = [q["sql"] for q in queries.captured_queries if "ecommerceapp_order" in q["sql"]]
+        self.assertLessEqual(len(order_queries), 8)
+
+        self.assertEqual(OrderUpdate.objects.filter(delivered=True).count(), 39)
+        self.assertEqual(Orders.objects.filter(paymentstatus="Delivered", delivered_at__isnull=False).count(), 39)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.paymentstatus, "Cancelled")
+
+        self.client.post("/admin/ecommerceapp/orders/", {"action": "mark_cancelled", "_selected_action": selected[:5]})
+        self.assertEqual(Orders.objects.filter(paymentstatus="Cancelled").count(), 5)
+        self.assertEqual(OrderUpdate.objects.filter(cancelled=True).count(), 5)
+
+    def test_profile_and_admin_load_timelines_in_fixed_queries(self):
+        user = User.objects.create_superuser("buyer", "buyer@example.com", "pw")
+        for n in range(3):
+            order = make_order({"1": [1, "Neem Soap", "₹150"]})
+            OrderUpdate.objects.create(order_id=order.order_id, update_desc=f"Packed #{n}")
+            OrderUpdate.objects.create(order_id=order.order_id, update_desc=f"Shipped #{n}", delivered=n == 0)
+        self.client.force_login(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/profile/")
+        order_queries = [q["sql"] for q in queries.captured_queries if "ecommerceapp_" in q["sql"]]
+        self.assertEqual(len(order_queries), 2, order_queries)
+        self.assertContains(response, "Packed #2")
+        self.assertContains(response, "Delivered")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/admin/ecommerceapp/orders/")
+        timeline_queries = [q["sql"] for q in queries.captured_queries if 'FROM "ecommerceapp_orderupdate"' in q["sql"]]
+        self.assertEqual(len(timeline_queries), 1)
+        self.assertContains(response, "Shipped #1")
+
+
+class DashboardMetricTests(TestCase):
+    def stored(self):
+        return {(name, key): value for name, key, value in DashboardMetric.objects.values_list("name", "key", "value") if value}
+
+    def expected(self):
+        return {key: value for key, value in metrics.collect().items() if value}
+
+    def test_counters_follow_writes(self):
+        soap = Product.objects.create(product_name="Neem Soap", category="Soap", desc="-", selling_price=150)
+        Product.objects.create(product_name="Hair Oil", category="Oil", desc="-", selling_price=300)
+        Contact.objects.create(name="A", email="a@example.com", desc="-", phonenumber=1)
+        CarouselAd.objects.create(title="Sale", image="ads/sale.png", link="https://example.com")
+        first = make_order({}, amount=150, state="Kerala", paymentstatus="Pending")
+        second = make_order({}, amount=300, state="Goa", paymentstatus="Pending", razorpay_order_id="order_m1")
+        self.assertEqual(self.stored(), self.expected())
+
+        first.state = "Goa"
+        first.amount = 175
+        first.save()
+        soap.category = "Oil"
+        soap.save()
+        second.razorpay_order_id = "order_m2"
+        with CaptureQueriesContext(connection) as queries:
+            second.save(update_fields=["razorpay_order_id"])
+        self.assertFalse([q for q in queries.captured_queries if "dashboardmetric" in q["sql"]])
+        OrderUpdate.objects.create(order_id=first.order_id, update_desc="Delivered", delivered=True)
+        paymentevents.record(paymentevents.event_from_browser("order_m2", "pay_m"))
+        paymentevents.process_pending()
+        self.assertEqual(self.stored(), self.expected())
+        self.assertEqual(self.stored()[("orders_by_status", "Paid")], 1)
+
+        second.delete()
+        Contact.objects.all().delete()
+        CarouselAd.objects.update(is_active=False)  # set-based: left for the repair command
+        call_command("repair_dashboard_metrics", stdout=io.StringIO())
+        self.assertEqual(self.stored(), self.expected())
+
+    def test_dashboard_reads_counters_only(self):
+        make_order({}, amount=150, state="Kerala")
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        with CaptureQueriesContext(connection) as queries:
+            kpis = self.client.get("/api/admin-dashboard/kpis/").json()
+            state = self.client.get("/api/admin-dashboard/state/").json()
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "ecommerceapp_orders"' in q["sql"]])
+        self.assertEqual((kpis["total_orders"], kpis["total_revenue"]), (1, 150))
+        self.assertEqual(state["labels"], ["Kerala"])
+
+
+class ContactDomainTests(TestCase):
+    def test_domain_is_stored_and_charted_in_sql(self):
+        for email in ("a@Gmail.com", "b@gmail.com", "c@example.org", "not-an-email"):
+            Contact.objects.create(name="C", email=email, desc="-", phonenumber=1)
+        legacy = Contact.objects.create(name="L", email="d@example.org", desc="-", phonenumber=1)
+        Contact.objects.filter(pk=legacy.pk).update(email_domain="")
+
+        call_command("backfill_contact_domains", stdout=io.StringIO())
+        self.assertEqual(Contact.objects.get(pk=legacy.pk).email_domain, "example.org")
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        with CaptureQueriesContext(connection) as queries:
+            chart = self.client.get("/api/admin-dashboard/contact_domains/").json()
+        contact_queries = [q["sql"] for q in queries.captured_queries if 'FROM "ecommerceapp_contact"' in q["sql"]]
+        self.assertEqual(len(contact_queries), 1)
+        self.assertIn("LIMIT 7", contact_queries[0])
+        self.assertEqual(chart["labels"], ["example.org", "gmail.com", "invalid-email"])
+        self.assertEqual(chart["values"], [2, 2, 1])
+
+        response = self.client.get("/admin/ecommerceapp/contact/", {"email_domain": "gmail.com"})
+        self.assertContains(response, "2 contacts")
+
+
+class DashboardServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_order({}, amount=150, state="Kerala")
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+
+    def test_admin_pages_render_without_dashboard_queries(self):
+        with mock.patch.object(dashboard, "compute") as compute:
+            index = self.client.get("/admin/")
+            self.client.get("/admin/ecommerceapp/orders/")
+            self.client.get(f"/admin/ecommerceapp/orders/{Orders.objects.get().pk}/change/")
+        compute.assert_not_called()
+        self.assertContains(index, "/api/admin-dashboard/kpis/")
+
+    def test_sections_are_cached_separately_with_their_own_headers(self):
+        with mock.patch.object(dashboard, "compute", wraps=dashboard.compute) as compute:
+            kpis = self.client.get("/api/admin-dashboard/kpis/")
+            self.client.get("/api/admin-dashboard/kpis/")
+            orders = self.client.get("/api/admin-dashboard/orders/", {"days": "7"})
+        self.assertEqual(compute.call_count, 2)
+        self.assertIn("max-age=60", kpis["Cache-Control"])
+        self.assertIn("private", kpis["Cache-Control"])
+        self.assertIn("max-age=300", orders["Cache-Control"])
+        self.assertEqual(len(orders.json()["labels"]), 7)
+
+        self.assertEqual(self.client.get("/api/admin-dashboard/nope/").status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/admin-dashboard/kpis/").status_code, 302)
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        self.assertEqual(dashboard.get_section("kpis")["total_orders"], 1)
+        key = dashboard._cache_key("kpis", dashboard.DASHBOARD_DAYS)
+        cache.set(key, {**cache.get(key), "fresh_until": 0}, 60)
+        make_order({}, amount=300, state="Goa")
+        refreshes = []
+
+        with mock.patch.object(dashboard, "_in_background", side_effect=refreshes.append):
+            self.assertEqual(dashboard.get_section("kpis")["total_orders"], 1)
+            self.assertEqual(dashboard.get_section("kpis")["total_orders"], 1)
+        self.assertEqual(len(refreshes), 1)  # the second reader found the lock held
+
+        refreshes[0]()
+        self.assertEqual(dashboard.get_section("kpis")["total_orders"], 2)
+        self.assertTrue(cache.add(f"{key}:lock", 1, 1))
+
+
+class OrderRollupTests(TestCase):
+    def order_on(self, day, amount, state="Kerala", paymentstatus="Pending"):
+        order = make_order({}, amount=amount, state=state, paymentstatus=paymentstatus)
+        created_at = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time())) + timedelta(hours=20)
+        Orders.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    def test_rollup_only_reprocesses_days_after_the_watermark(self):
+        today = timezone.localdate()
+        old_day, recent_day = today - timedelta(days=20), today - timedelta(days=3)
+        self.order_on(old_day, 100)
+        recent = self.order_on(recent_day, 150, paymentstatus="Paid")
+        self.order_on(recent_day, 50, state="Goa")
+
+        self.assertEqual(rollups.roll_up(today=today), (old_day, today))
+        stats = DailyOrderStats.objects.get(day=recent_day)
+        self.assertEqual((stats.orders, stats.revenue, stats.paid_orders, stats.pending_orders), (2, 200, 1, 1))
+        self.assertEqual(DailyStateOrderStats.objects.get(day=recent_day, state="Goa").revenue, 50)
+
+        # A late status change inside the lookback window is picked up; an
+        # old day behind the watermark is left alone until forced.
+        Orders.objects.filter(pk=recent.pk).update(paymentstatus="Pending")
+        self.order_on(old_day, 999)
+        start, _ = rollups.roll_up(today=today)
+        self.assertGreater(start, old_day)
+        self.assertEqual(DailyOrderStats.objects.get(day=recent_day).paid_orders, 0)
+        self.assertEqual(DailyOrderStats.objects.get(day=old_day).orders, 1)
+
+        call_command("rollup_orders", since=old_day, stdout=io.StringIO())
+        self.assertEqual(DailyOrderStats.objects.get(day=old_day).revenue, 1099)
+
+        series = rollups.daily_series(today - timedelta(days=4), today)
+        self.assertEqual([row["orders"] for row in series], [0, 2, 0, 0, 0])
+
+    def test_dashboard_charts_read_a_bounded_range(self):
+        self.order_on(timezone.localdate() - timedelta(days=400), 100)
+        self.order_on(timezone.localdate(), 250)
+        orders, revenue = dashboard.get_section("orders"), dashboard.get_section("revenue")
+        self.assertEqual(len(orders["labels"]), dashboard.DASHBOARD_DAYS)
+        self.assertEqual((orders["values"][-1], revenue["values"][-1]), (1, 250))
+        self.assertFalse(DailyOrderStats.objects.exists())  # reading never rolls up
+
+    def test_series_reads_rolled_days_and_aggregates_the_rest_live(self):
+        today = timezone.localdate()
+        yesterday = self.order_on(today - timedelta(days=1), 100)
+        rollups.roll_up(today=today)
+        # Rolled days are served from the table until the next rollup...
+        Orders.objects.filter(pk=yesterday.pk).update(amount=400)
+        # ...while days after the watermark are read from the orders.
+        self.order_on(today, 250)
+
+        with CaptureQueriesContext(connection) as queries:
+            series = rollups.daily_series(today - timedelta(days=1), today)
+        self.assertEqual([(row["orders"], row["revenue"]) for row in series], [(1, 100), (1, 250)])
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any(q["sql"].startswith(("INSERT", "UPDATE", "DELETE")) for q in queries.captured_queries))
+
+
+class CsvExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+
+    def test_orders_export_streams_only_the_exported_columns(self):
+        first = make_order({}, amount=150, state="Kerala")
+        second = make_order({}, amount=300, state="Goa")
+        response = self.client.get(reverse("admin:ecommerceapp_orders_export_csv"))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="orders_all.csv"')
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        order_queries = [q["sql"] for q in queries.captured_queries if 'FROM "ecommerceapp_orders"' in q["sql"]]
+        self.assertEqual(len(order_queries), 1)
+        self.assertNotIn("products_summary", order_queries[0])
+        self.assertEqual(rows[0], list(OrdersAdmin.csv_fields))
+        self.assertEqual([row[0] for row in rows[1:]], [str(second.pk), str(first.pk)])
+        self.assertEqual(rows[1][OrdersAdmin.csv_fields.index("amountpaid")], "")
+
+    def test_selected_contacts_export(self):
+        contact = Contact.objects.create(name="C", email="c@example.org", desc="Hi, there", phonenumber=1)
+        Contact.objects.create(name="D", email="d@example.org", desc="-", phonenumber=2)
+        response = self.client.post(
+            "/admin/ecommerceapp/contact/",
+            {"action": "export_selected_to_csv", "_selected_action": [contact.pk]},
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(
+            list(csv.reader(io.StringIO(content))),
+            [list(ContactAdmin.csv_fields), [str(contact.pk), "C", "c@example.org", "Hi, there", "1"]],
+        )
+
+
+class PaymentGatewayTests(TestCase):
+    def test_circuit_opens_after_failures_and_half_opens_later(self):
+        now = [0.0]
+        breaker = payments.CircuitBreaker(threshold=2, reset_timeout=30, clock=lambda: now[0])
+        gateway = payments.FakeGateway(fail=True, breaker=breaker)
+
+        for _ in range(2):
+            with self.assertRaises(payments.PaymentGatewayUnavailable):
+                gateway.create_order(10000, "r")
+        self.assertEqual(breaker.state, breaker.OPEN)
+
+        gateway.fail = False
+        with self.assertRaisesMessage(payments.PaymentGatewayUnavailable, "circuit is open"):
+            gateway.create_order(10000, "r")
+
+        now[0] = 31
+        self.assertTrue(gateway.create_order(10000, "r")["id"])
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+    def test_payment_signature_is_checked_locally(self):
+        gateway = payments.FakeGateway(key_secret="s3cret")
+        signature = gateway.sign("order_1", "pay_1")
+
+        self.assertTrue(payments.verify_payment_signature("order_1", "pay_1", signature, "s3cret"))
+        self.assertFalse(payments.verify_payment_signature("order_1", "pay_2", signature, "s3cret"))
+        self.assertFalse(payments.verify_payment_signature("order_1", "pay_1", signature, ""))
+
+    def test_razorpay_client_reports_its_version_without_pkg_resources(self):
+        session = mock.Mock()
+        session.post.return_value = mock.Mock(status_code=200, json=lambda: {"id": "order_rzp1"})
+        gateway = payments.RazorpayGateway("rzp_test_key", "secret", session=session)
+
+        with mock.patch("pkg_resources.require") as require:
+            self.assertEqual(gateway.create_order(10000, "r")["id"], "order_rzp1")
+        require.assert_not_called()
+        user_agent = session.post.call_args.kwargs["headers"]["User-Agent"]
+        self.assertTrue(user_agent.startswith(f"Razorpay-Python/{payments.RAZORPAY_SDK_VERSION} "))
+        self.assertTrue(payments.RAZORPAY_SDK_VERSION)
+
+    @override_settings(PAYMENT_GATEWAY="fake", RAZORPAY_KEY_SECRET="s3cret")
+    def test_payment_success_marks_the_order_paid(self):
+        gateway = payments.get_gateway()
+        order = make_order({}, amount=250, razorpay_order_id="order_fake1")
+        payload = {"razorpay_order_id": "order_fake1", "razorpay_payment_id": "pay_1"}
+
+        self.client.post("/payment_success/", {**payload, "razorpay_signature": "forged"})
+        order.refresh_from_db()
+        self.assertNotEqual(order.paymentstatus, "Paid")
+
+        self.client.post("/payment_success/", {**payload, "razorpay_signature": gateway.sign("order_fake1", "pay_1")})
+        order.refresh_from_db()
+        self.assertEqual(order.paymentstatus, "Paid")
+
+
+@override_settings(PAYMENT_GATEWAY="fake", RAZORPAY_KEY_SECRET="s3cret", RAZORPAY_WEBHOOK_SECRET="whsec")
+class PaymentWebhookTests(TestCase):
+    def setUp(self):
+        self.order = make_order({}, amount=250, razorpay_order_id="order_fake1", paymentstatus="Pending")
+
+    def deliver(self, event="payment.captured", event_id="evt_1", secret="whsec", amount=25000):
+        body = json.dumps({
+            "event": event,
+            "payload": {"payment": {"entity": {"id": "pay_1", "order_id": "order_fake1", "amount": amount}}},
+        }).encode()
+        signature = payments._hmac_sha256(secret, body)
+        return self.client.post(
+            "/payments/webhook/", body, content_type="application/json",
+            HTTP_X_RAZORPAY_SIGNATURE=signature, HTTP_X_RAZORPAY_EVENT_ID=event_id,
+        )
+
+    def test_webhook_records_once_and_answers_before_applying(self):
+        self.assertEqual(self.deliver(secret="wrong").status_code, 400)
+        self.assertEqual(self.deliver().status_code, 200)
+        self.assertEqual(self.deliver().status_code, 200)  # redelivery
+
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paymentstatus, "Pending")
+
+        self.assertEqual(paymentevents.process_pending(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.paymentstatus, self.order.amountpaid), ("Paid", "250"))
+
+    def test_browser_and_webhook_race_writes_once(self):
+        signature = payments.get_gateway().sign("order_fake1", "pay_1")
+        data = {"razorpay_order_id": "order_fake1", "razorpay_payment_id": "pay_1", "razorpay_signature": signature}
+        self.client.post("/payment_success/", data)
+        self.client.post("/payment_success/", data)
+        self.deliver()
+        self.deliver(event="payment.failed", event_id="evt_2")
+        paymentevents.process_pending()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paymentstatus, "Paid")
+        self.assertEqual(OrderUpdate.objects.filter(order_id=self.order.order_id).count(), 1)
+        self.assertEqual(
+            sorted(PaymentEvent.objects.values_list("outcome", flat=True)), ["applied", "noop", "noop"]
+        )
+
+    def test_batches_are_claimed_skipping_locked_events(self):
+        self.deliver()
+        select_for_update = QuerySet.select_for_update
+        with mock.patch.object(
+            QuerySet, "select_for_update", autospec=True, side_effect=select_for_update
+        ) as claim:
+            self.assertEqual(paymentevents.process_pending(), 1)
+
+        self.assertEqual(claim.call_args.kwargs, {"skip_locked": True})
+        self.assertIs(claim.call_args.args[0].model, PaymentEvent)
+
+    def test_captured_amount_must_match_the_order(self):
+        self.deliver(amount=100)
+        with self.assertLogs("ecommerceapp.paymentevents", "WARNING"):
+            paymentevents.process_pending()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paymentstatus, "Pending")
+        self.assertEqual(PaymentEvent.objects.get().outcome, "amount-mismatch")
+
+    def test_failing_event_is_retried_alone_then_given_up(self):
+        other = make_order({}, amount=100, razorpay_order_id="order_fake2", paymentstatus="Pending")
+        self.deliver()
+        paymentevents.record(PaymentEvent(key="evt_2", event="payment.captured", razorpay_order_id="order_fake2"))
+        apply_event = paymentevents.apply_event
+
+        def fail_first_order(event, order):
+            outcome = apply_event(event, order)  # its writes must be rolled back
+            if event.key == "evt_1":
+                raise DatabaseError("boom")
+            return outcome
+
+        with (
+            mock.patch.object(paymentevents, "apply_event", side_effect=fail_first_order),
+            self.assertLogs("ecommerceapp.paymentevents", "ERROR"),
+        ):
+            for _ in range(paymentevents.MAX_ATTEMPTS - 1):
+                paymentevents.process_pending()
+
+            failing = PaymentEvent.objects.get(key="evt_1")
+            self.assertEqual((failing.attempts, failing.processed_at), (paymentevents.MAX_ATTEMPTS - 1, None))
+            self.assertIn("boom", failing.last_error)
+            self.order.refresh_from_db()
+            other.refresh_from_db()
+            self.assertEqual((self.order.paymentstatus, other.paymentstatus), ("Pending", "Paid"))
+
+            self.assertEqual(paymentevents.process_pending(), 1)
+        self.assertEqual(PaymentEvent.objects.get(key="evt_1").outcome, "failed")
+        self.assertEqual(paymentevents.process_pending(), 0)
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Product.objects.bulk_create(
+            Product(product_name=f"Item {n}", category="Soap", desc="-", mrp=200, selling_price=150)
+            for n in range(50)
+        )
+        self.cart = json.dumps({str(pk): [2, "whatever", "₹1"] for pk in Product.objects.values_list("id", flat=True)})
+
+    def catalog_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+        return result, [q["sql"] for q in queries if "ecommerceapp_" in q["sql"]]
+
+    def test_fifty_line_cart_is_one_query(self):
+        quote, queries = self.catalog_queries(lambda: price_cart(self.cart))
+        self.assertEqual(len(queries), 1)
+        self.assertIn("IN (", queries[0])
+        self.assertEqual((len(quote["lines"]), quote["total"], quote["discount"]), (50, 15000, 5000))
+
+    @override_settings(PAYMENT_GATEWAY="fake")
+    def test_checkout_blocks_tampered_amount_before_the_gateway(self):
+        self.client.force_login(User.objects.create_user("shopper", "s@example.com", "pw"))
+        with mock.patch.object(payments.FakeGateway, "create_order") as create_order:
+            response = self.client.post("/checkout/", {"itemsJson": self.cart, "amt": "1"})
+        create_order.assert_not_called()
+        self.assertContains(response, "Prices in your cart have changed")
+        self.assertFalse(Orders.objects.exists())
+
+    @override_settings(PAYMENT_GATEWAY="fake")
+    def test_over_limit_quantity_is_capped_in_the_quote_and_refused_at_checkout(self):
+        pk = Product.objects.values_list("id", flat=True).first()
+        cart = json.dumps({str(pk): [150, "Item 0", "₹150"]})
+
+        quote = self.client.post("/cart/preview/", cart, content_type="application/json").json()
+        self.assertEqual((quote["lines"][0]["quantity"], quote["total"], quote["over_limit"]), (99, 14850, [pk]))
+
+        self.client.force_login(User.objects.create_user("shopper", "s@example.com", "pw"))
+        response = self.client.post("/checkout/", {"itemsJson": cart, "amt": "14850"})
+        self.assertContains(response, "You can order at most 99 of each item")
+        self.assertNotContains(response, "Prices in your cart have changed")
+        self.assertFalse(Orders.objects.exists())
+
+    def test_cart_preview_endpoint(self):
+        response = self.client.post("/cart/preview/", self.cart, content_type="application/json")
+        self.assertEqual(response.json()["total"], 15000)
+
+        response = self.client.post("/cart/preview/", json.dumps({"pr1": [1, "x", "₹1"]}), content_type="application/json")
+        self.assertEqual(response.json()["unavailable"], [None])
+
+    def test_cart_preview_needs_the_csrf_token_and_caches_nothing(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertEqual(client.post("/cart/preview/", self.cart, content_type="application/json").status_code, 403)
+
+        client.cookies["csrftoken"] = token = "t" * 32
+        with mock.patch.object(cache, "set") as cache_set, mock.patch.object(cache, "add") as cache_add:
+            response = client.post("/cart/preview/", self.cart, content_type="application/json", HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.json()["total"], 15000)
+        cache_set.assert_not_called()
+        cache_add.assert_not_called()
+
+
+@override_settings(PAYMENT_GATEWAY="fake")
+class IdempotentCheckoutTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        product = Product.objects.create(product_name="Neem Soap", category="Soap", desc="-", selling_price=150)
+        self.shopper = User.objects.create_user("shopper", "s@example.com", "pw")
+        self.form = {
+            "idempotency_key": "k" * 32,
+            "itemsJson": json.dumps({str(product.id): [2, "Neem Soap", "₹150"]}),
+            "amt": "300",
+            "name": "Buyer",
+        }
+
+    def submit(self, username="shopper", **changes):
+        client = Client()
+        client.login(username=username, password="pw")
+        return client.post("/checkout/", {**self.form, **changes})
+
+    def test_repeat_submit_returns_the_existing_gateway_order(self):
+        first = self.submit()
+        with mock.patch.object(payments.FakeGateway, "create_order") as create_order:
+            second = self.submit()
+        create_order.assert_not_called()
+        self.assertEqual(first.context["razorpay_order_id"], second.context["razorpay_order_id"])
+        self.assertEqual(Orders.objects.count(), 1)
+
+    def test_key_is_scoped_to_the_user_and_the_cart(self):
+        first = self.submit(name="Buyer", phone="98765")
+        User.objects.create_user("other", "o@example.com", "pw")
+
+        replay = self.submit(username="other", name="Other")
+        self.assertEqual(replay.context["name"], "Other")
+        self.assertNotEqual(replay.context["razorpay_order_id"], first.context["razorpay_order_id"])
+        self.assertEqual(Orders.objects.count(), 2)
+
+        product = Product.objects.get()
+        with self.assertLogs("django.request", "WARNING"):
+            changed = self.submit(itemsJson=json.dumps({str(product.id): [3, "Neem Soap", "₹150"]}), amt="450")
+        self.assertEqual(changed.status_code, 409)
+        self.assertNotContains(changed, first.context["razorpay_order_id"], status_code=409)
+        self.assertNotEqual(changed.context["checkout_key"], self.form["idempotency_key"])
+        self.assertEqual(Orders.objects.count(), 2)
+
+    def test_racing_submit_gets_the_order_the_winner_created(self):
+        self.submit()
+        quote = price_cart(self.form["itemsJson"])
+        key = views.scoped_checkout_key(self.shopper, self.form["idempotency_key"])
+        order, created = views.create_checkout_order(key, quote, name="Buyer")
+        self.assertFalse(created)
+        self.assertEqual(order, Orders.objects.get())
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+    def test_resubmit_waits_for_the_gateway_lock_holder(self):
+        order, _ = views.create_checkout_order(self.form["idempotency_key"], price_cart(self.form["itemsJson"]))
+        lock_key = f"checkout:{order.order_id}:gateway"
+        self.assertTrue(cache.add(lock_key, 1, 30))  # another request is calling the gateway
+
+        def holder_finishes(seconds):
+            Orders.objects.filter(pk=order.pk).update(razorpay_order_id="order_winner")
+
+        with (
+            mock.patch.object(payments.FakeGateway, "create_order") as create_order,
+            mock.patch("ecommerceapp.views.time.sleep", side_effect=holder_finishes),
+        ):
+            self.assertEqual(views.ensure_gateway_order(order), "order_winner")
+        create_order.assert_not_called()
+
+    def test_lock_holder_creates_the_gateway_order_once_and_releases_the_lock(self):
+        order, _ = views.create_checkout_order(self.form["idempotency_key"], price_cart(self.form["itemsJson"]))
+        gateway = payments.get_gateway()
+        created_before = len(gateway.orders)
+        gateway_id = views.ensure_gateway_order(order)
+        self.assertEqual(views.ensure_gateway_order(Orders.objects.get()), gateway_id)
+        self.assertEqual(len(gateway.orders), created_before + 1)
+        self.assertTrue(cache.add(f"checkout:{order.order_id}:gateway", 1, 30))
+
+    def test_concurrent_submits_create_one_order_and_one_gateway_order(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite fails concurrent writers instead of making them wait")
+        gateway = payments.get_gateway()
+        created_before = len(gateway.orders)
+        results = []
+        errors = []
+
+        def submit():
+            try:
+                results.append(self.submit().context["razorpay_order_id"])
+            except Exception as exc:  # surfaced below
+                errors.append(exc)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        with mock.patch.object(gateway, "latency", 0.2):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(gateway.orders), created_before + 1)
+        self.assertEqual(Orders.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 1)
+        self.assertEqual(OrderUpdate.objects.count(), 1)
+
+
+class CountingStorage:
+    def __init__(self):
+        self.calls = 0
+
+    def url(self, name):
+        self.calls += 1
+        return f"/media/{name}"
+
+
+class MediaURLCacheTests(SimpleTestCase):
+    def test_resolves_each_name_once_and_evicts_least_recent(self):
+        storage = CountingStorage()
+        urls = MediaURLCache(maxsize=2)
+
+        self.assertEqual(urls.resolve("a.jpg", storage), "/media/a.jpg")
+        urls.resolve("b.jpg", storage)
+        urls.resolve("a.jpg", storage)
+        self.assertEqual(storage.calls, 2)
+
+        urls.resolve("c.jpg", storage)  # evicts b.jpg, the least recently used
+        urls.resolve("a.jpg", storage)
+        urls.resolve("b.jpg", storage)
+        self.assertEqual(storage.calls, 4)
@@ -7,9 +7,19 @@ urlpatterns = [
     path('about/', views.about, name="about"),
     path('profile/', views.profile, name="profile"),
     path('checkout/', views.checkout, name="checkout"),
+    path('cart/preview/', views.cart_preview, name="cart_preview"),
     path("payment_success/", views.payment_success, name="payment_success"),
+    path("payments/webhook/", views.payment_webhook, name="payment_webhook"),
 
     # AJAX endpoint used by the frontend autocomplete dropdown.  Returns a
     # filtered list of product names and active shop categories.
     path('autocomplete/', views.autocomplete, name="autocomplete"),
+    path('autocomplete/stats/', views.autocomplete_stats, name="autocomplete_stats"),
+
+    # Admin dashboard charts, each loaded separately by admin/index.html.
+    path('api/admin-dashboard/<slug:section>/', views.dashboard_section, name="dashboard_section"),
+
+    # Paginated product cards for one homepage category section; the
+    # homepage renders the first slide and lazy-loads the rest from here.
+    path('api/catalog/<slug:category_slug>/', views.catalog_section, name="catalog_section"),
 ]
\ No newline at end of file
@@ -1,90 +1,136 @@
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
-from django.db.models import Q
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
-from django.utils.text import slugify
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+
+from ecommerceapp.models import Contact, OrderUpdate, Orders, PaymentEvent
+from ecommerceapp import dashboard, paymentevents, suggest
+from ecommerceapp.orderitems import create_order_items
+from ecommerceapp.pricing import MAX_LINE_QUANTITY, cart_quantities, price_cart, quote_items_json
+from ecommerceapp.payments import (
+    PaymentGatewayError,
+    PaymentGatewayUnavailable,
+    get_gateway,
+    verify_webhook_signature,
+)
+from ecommerceapp.catalog import (
+    CATALOG_PAGE_SIZE,
+    CATALOG_PAGE_SIZE_MAX,
+    catalog_etag,
+    get_catalog_last_modified,
+    get_catalog_page,
+    get_catalog_sections,
+    normalize_query,
+)
 
-from ecommerceapp.models import Contact, Product, OrderUpdate, Orders, CarouselAd, ShopCategory
-
-import razorpay
 import traceback
+import hashlib
 import json
-from datetime import timedelta
+import time
+import uuid
 
 
 # ==============================
-# Homepage
+# Conditional GET
 # ==============================
-def index(request):
-    query = request.GET.get("query", "").strip()
+def _is_shared_homepage(request):
+    # Only anonymous visitors without pending flash messages see a page that
+    # depends on nothing but the catalog and the query string.
+    return not request.user.is_authenticated and not len(messages.get_messages(request))
 
-    try:
-        products_qs = Product.objects.all()
-
-        if query:
-            products_qs = products_qs.filter(
-                Q(product_name__icontains=query) |
-                Q(category__icontains=query) |
-                Q(subcategory__icontains=query) |
-                Q(desc__icontains=query)
-            )
 
-        allProds = []
-        catprods = products_qs.values("category", "id")
-        cats = {item["category"] for item in catprods}
-        category_anchor_map = {}
-
-        for cat in cats:
-            prod = products_qs.filter(category=cat)
-            n = len(prod)
-            nSlides = n // 4 + (1 if n % 4 != 0 else 0)
-            allProds.append([prod, range(1, nSlides + 1), nSlides])
-            category_anchor_map[slugify(cat)] = f"category-{slugify(cat)}"
-
-        shop_categories = (
-            ShopCategory.objects.filter(is_active=True)
-            .exclude(image="")
-            .exclude(image__isnull=True)
-        )
-
-        shop_category_cards = []
-        for item in shop_categories:
-            section_slug = slugify(item.section_name)
-            section_anchor = category_anchor_map.get(section_slug)
-            if section_anchor:
-                href = f"#{section_anchor}"
-            else:
-                href = f"/?query={item.section_name}"
-            shop_category_cards.append(
-                {
-                    "name": item.section_name,
-                    "image": item.image,
-                    "href": href,
-                }
-            )
+def homepage_etag(request):
+    if _is_shared_homepage(request):
+        return catalog_etag("index", normalize_query(request.GET.get("query")))
+    return None
 
-        ads = (
-            CarouselAd.objects.filter(is_active=True)
-            .exclude(image="")
-            .exclude(image__isnull=True)
-        )
 
-        return render(request, "index.html", {
-            "allProds": allProds,
+def homepage_last_modified(request):
+    if _is_shared_homepage(request):
+        return get_catalog_last_modified()
+    return None
+
+
+def catalog_section_etag(request, category_slug):
+    return catalog_etag("catalog_section", request.get_full_path())
+
+
+def autocomplete_etag(request):
+    q = request.GET.get('q', '').strip()
+    version, _ = suggest.index.current_state()
+    return catalog_etag("autocomplete", q, version=version)
+
+
+def autocomplete_last_modified(request):
+    _, modified = suggest.index.current_state()
+    return modified
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_catalog_last_modified()
+
+
+def revalidate(response):
+    """Let browsers and proxies keep the body but check its validator each time."""
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+# ==============================
+# Homepage
+# ==============================
+@condition(etag_func=homepage_etag, last_modified_func=homepage_last_modified)
+def index(request):
+    query = normalize_query(request.GET.get("query"))
+
+    try:
+        response = render(request, "index.html", {
             "query": query,
-            "ads": ads,
-            "shop_categories": shop_category_cards,
+            "catalog": get_catalog_sections(query),
         })
+        if response.has_header("ETag"):
+            revalidate(response)
+        return response
 
     except Exception as e:
         print("Homepage error:", traceback.format_exc())
-        return HttpResponse("Site is live. Homepage recovering.")
+        response = HttpResponse("Site is live. Homepage recovering.")
+        # Never let a browser revalidate against the fallback page.
+        patch_cache_control(response, no_store=True)
+        return response
+
+
+@condition(etag_func=catalog_section_etag, last_modified_func=catalog_last_modified)
+def catalog_section(request, category_slug):
+    """Return one keyset-paginated page of a homepage category section.
+
+    ``?after=<product id>`` continues after the last product already shown
+    and ``?limit=`` sets the page size. ``next`` holds the URL of the
+    following page, or null on the last one.
+    """
+    try:
+        after = int(request.GET.get("after", 0))
+        limit = int(request.GET.get("limit", CATALOG_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor."}, status=400)
+    limit = max(1, min(limit, CATALOG_PAGE_SIZE_MAX))
+
+    page = get_catalog_page(category_slug, after, limit)
+    if page is None:
+        return JsonResponse({"error": "Unknown category."}, status=404)
+    return revalidate(JsonResponse(page))
 
 
+@condition(etag_func=autocomplete_etag, last_modified_func=autocomplete_last_modified)
 def autocomplete(request):
     """Return JSON list of product names and active shop categories.
 
@@ -96,31 +142,36 @@ def autocomplete(request):
 
     The frontend uses this to render suggestions and navigate directly
     to a product card or category section when a suggestion is clicked.
+    Suggestions come from the in-process index in ``suggest``, so a
+    keystroke does not hit the database.
     """
     q = request.GET.get('q', '').strip()
 
-    products = Product.objects.all()
-    categories = ShopCategory.objects.filter(is_active=True)
+    suggestions, elapsed_ms = suggest.index.suggest(q)
 
-    if q:
-        products = products.filter(product_name__icontains=q)
-        categories = categories.filter(section_name__icontains=q)
+    response = JsonResponse(suggestions, safe=False)
+    response["Server-Timing"] = f"suggest;dur={elapsed_ms:.3f}"
+    return revalidate(response)
 
-    suggestions = []
-    for p in products[:50]:
-        suggestions.append({
-            'type': 'product',
-            'label': p.product_name,
-            'id': p.id,
-        })
-    for c in categories:
-        suggestions.append({
-            'type': 'category',
-            'label': c.section_name,
-            'slug': slugify(c.section_name),
-        })
 
-    return JsonResponse(suggestions, safe=False)
+@staff_member_required
+def autocomplete_stats(request):
+    """Rebuild and lookup timings of this worker's suggestion index."""
+    return JsonResponse(suggest.index.snapshot())
+
+
+# ==============================
+# Admin dashboard
+# ==============================
+@staff_member_required
+def dashboard_section(request, section):
+    """One admin dashboard chart or the KPI cards, fetched after the page renders."""
+    if section not in dashboard.SECTIONS:
+        raise Http404("Unknown dashboard section")
+    response = JsonResponse(dashboard.get_section(section, request.GET.get("days")))
+    patch_cache_control(response, private=True, max_age=dashboard.SECTIONS[section].fresh_for)
+    patch_vary_headers(response, ("Cookie",))
+    return response
 
 
 # ==============================
@@ -188,6 +239,84 @@ def about(request):
 # ==============================
 # Checkout
 # ==============================
+CHECKOUT_KEY_MAX_LENGTH = 64
+# How long a checkout may hold the right to create its gateway order, and
+# how long a concurrent resubmit waits for the result.
+CHECKOUT_GATEWAY_LOCK_TIMEOUT = 30
+CHECKOUT_GATEWAY_WAIT = 15
+CHECKOUT_GATEWAY_POLL = 0.1
+
+
+def checkout_form(request, checkout_key=None, status=200):
+    # A fresh key per form; error re-renders keep the submitted one so a
+    # retry still finds the order that may already exist for it.
+    return render(request, 'checkout.html', {"checkout_key": checkout_key or uuid.uuid4().hex}, status=status)
+
+
+def scoped_checkout_key(user, checkout_key):
+    """The stored idempotency key: the form's key bound to the user who sent it.
+
+    Another user replaying the same form key never finds this order.
+    """
+    return hashlib.sha256(f"{user.pk}:{checkout_key}".encode()).hexdigest()
+
+
+def create_checkout_order(checkout_key, quote, **fields):
+    """Create the order, its lines and first update in one transaction.
+
+    Returns ``(order, created)``; a concurrent submit with the same key
+    gets the order the other request created.
+    """
+    items_json = quote_items_json(quote)
+    try:
+        with transaction.atomic():
+            order = Orders.objects.create(
+                idempotency_key=checkout_key,
+                items_json=items_json,
+                amount=quote["total"],
+                paymentstatus="Pending",
+                **fields,
+            )
+            create_order_items(order, items_json)
+            OrderUpdate.objects.create(
+                order_id=order.order_id,
+                update_desc="Order placed - Payment pending"
+            )
+    except IntegrityError:
+        return Orders.objects.get(idempotency_key=checkout_key), False
+    return order, True
+
+
+def ensure_gateway_order(order):
+    """Return the order's Razorpay order id, creating it at most once.
+
+    Only the request holding the per-order lock calls the gateway; any
+    concurrent resubmit waits for the stored id instead.
+    """
+    if order.razorpay_order_id:
+        return order.razorpay_order_id
+
+    lock_key = f"checkout:{order.order_id}:gateway"
+    if cache.add(lock_key, 1, CHECKOUT_GATEWAY_LOCK_TIMEOUT):
+        try:
+            order.refresh_from_db(fields=["razorpay_order_id"])
+            if not order.razorpay_order_id:
+                razorpay_order = get_gateway().create_order(order.amount_paise, f"order_{order.order_id}")
+                order.razorpay_order_id = razorpay_order['id']
+                order.save(update_fields=["razorpay_order_id"])
+        finally:
+            cache.delete(lock_key)
+        return order.razorpay_order_id
+
+    deadline = time.monotonic() + CHECKOUT_GATEWAY_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(CHECKOUT_GATEWAY_POLL)
+        order.refresh_from_db(fields=["razorpay_order_id"])
+        if order.razorpay_order_id:
+            return order.razorpay_order_id
+    raise PaymentGatewayUnavailable("payment is still being prepared by another request")
+
+
 def checkout(request):
     if not request.user.is_authenticated:
         messages.warning(request, "Login & Try Again")
@@ -195,81 +324,93 @@ def checkout(request):
 
     if request.method == "POST":
 
+        checkout_key = request.POST.get('idempotency_key', '').strip()[:CHECKOUT_KEY_MAX_LENGTH] or uuid.uuid4().hex
+        order_key = scoped_checkout_key(request.user, checkout_key)
         items_json = request.POST.get('itemsJson', '{}')
-        name = request.POST.get('name', '')
-        amount_raw = request.POST.get('amt', '0')
-        email = request.POST.get('email', '')
-        address1 = request.POST.get('address1', '')
-        address2 = request.POST.get('address2', '')
-        city = request.POST.get('city', '')
-        state = request.POST.get('state', '')
-        zip_code = request.POST.get('zip_code', '')
-        phone = request.POST.get('phone', '')
-
-        try:
-            amount_rupees = float(amount_raw) if amount_raw not in ['NaN', ''] else 0
-            amount_paise = max(100, int(amount_rupees * 100))
-        except:
-            messages.error(request, "Invalid amount in cart")
-            return render(request, 'checkout.html')
-
-        if amount_rupees < 1:
-            messages.error(request, "Cart is empty.")
-            return render(request, 'checkout.html')
-
-        # Save order
-        order = Orders.objects.create(
-            items_json=items_json,
-            name=name,
-            amount=int(amount_rupees),
-            email=email,
-            address1=address1,
-            address2=address2,
-            city=city,
-            state=state,
-            zip_code=zip_code,
-            phone=phone,
-            paymentstatus="Pending"
-        )
-
-        OrderUpdate.objects.create(
-            order_id=order.order_id,
-            update_desc="Order placed - Payment pending"
-        )
-
-        try:
-            client = razorpay.Client(
-                auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+        order = Orders.objects.filter(idempotency_key=order_key).first()
+
+        if order is not None and cart_quantities(order.items_json) != cart_quantities(items_json):
+            # The key was already used for another cart: start a new checkout
+            # rather than resume that order.
+            messages.error(request, "Your cart changed since this checkout was started. Please review it and pay again.")
+            return checkout_form(request, status=409)
+
+        if order is None:
+            amount_raw = request.POST.get('amt', '0')
+
+            try:
+                amount_rupees = float(amount_raw) if amount_raw not in ['NaN', ''] else 0
+            except:
+                messages.error(request, "Invalid amount in cart")
+                return checkout_form(request, checkout_key)
+
+            # Price the cart server-side; the browser's prices and total are
+            # only used to detect a stale or tampered cart.
+            quote = price_cart(items_json)
+            if not quote["lines"]:
+                messages.error(request, "Cart is empty.")
+                return checkout_form(request, checkout_key)
+            if quote["unavailable"]:
+                messages.error(request, "Some items in your cart are no longer available. Please review your cart.")
+                return checkout_form(request, checkout_key)
+            if quote["over_limit"]:
+                messages.error(request, f"You can order at most {MAX_LINE_QUANTITY} of each item. Please update your cart.")
+                return checkout_form(request, checkout_key)
+            if round(amount_rupees) != quote["total"]:
+                messages.error(request, "Prices in your cart have changed. Please review your cart and try again.")
+                return checkout_form(request, checkout_key)
+
+            order, _ = create_checkout_order(
+                order_key,
+                quote,
+                name=request.POST.get('name', ''),
+                email=request.POST.get('email', ''),
+                address1=request.POST.get('address1', ''),
+                address2=request.POST.get('address2', ''),
+                city=request.POST.get('city', ''),
+                state=request.POST.get('state', ''),
+                zip_code=request.POST.get('zip_code', ''),
+                phone=request.POST.get('phone', ''),
             )
 
-            razorpay_order = client.order.create({
-                'amount': amount_paise,
-                'currency': 'INR',
-                'receipt': f"order_{order.order_id}",
-                'payment_capture': 1,
-            })
-
-        except Exception as e:
+        try:
+            razorpay_order_id = ensure_gateway_order(order)
+        except PaymentGatewayUnavailable as e:
+            print("Razorpay unavailable:", e)
+            messages.error(request, "Payments are temporarily unavailable. Please try again in a minute.")
+            return checkout_form(request, checkout_key)
+        except PaymentGatewayError as e:
             print("Razorpay Error:", e)
             messages.error(request, "Payment initialization failed.")
-            return render(request, 'checkout.html')
-
-        # Save Razorpay order id
-        order.razorpay_order_id = razorpay_order['id']
-        order.save()
+            return checkout_form(request, checkout_key)
 
         return render(request, 'razorpay.html', {
-            'razorpay_order_id': razorpay_order['id'],
-            'razorpay_amount': amount_paise,
-            'razorpay_key': settings.RAZORPAY_KEY_ID,
+            'razorpay_order_id': razorpay_order_id,
+            'razorpay_amount': order.amount_paise,
+            'razorpay_key': get_gateway().key_id,
             'order_id': order.order_id,
-            'name': name,
-            'email': email,
-            'phone': phone,
-            'amount': amount_rupees
+            'name': order.name,
+            'email': order.email,
+            'phone': order.phone,
+            'amount': order.amount
         })
 
-    return render(request, 'checkout.html')
+    return checkout_form(request)
+
+
+# ==============================
+# Cart preview
+# ==============================
+@require_POST
+def cart_preview(request):
+    """Server-side prices for the cart in the request body.
+
+    Accepts the storefront cart JSON (``{id: [qty, name, price]}``) as the
+    body or as ``itemsJson``; the checkout page sends its CSRF token along.
+    Only the first ``pricing.MAX_CART_LINES`` lines are priced.
+    """
+    items_json = request.POST.get("itemsJson") if request.POST else request.body.decode("utf-8", "replace")
+    return JsonResponse(price_cart(items_json or "{}"))
 
 
 # ==============================
@@ -284,26 +425,22 @@ def payment_success(request):
         razorpay_payment_id = request.POST.get('razorpay_payment_id')
         razorpay_signature = request.POST.get('razorpay_signature')
 
-        client = razorpay.Client(
-            auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-        )
-
         try:
-            client.utility.verify_payment_signature({
-                'razorpay_order_id': razorpay_order_id,
-                'razorpay_payment_id': razorpay_payment_id,
-                'razorpay_signature': razorpay_signature
-            })
-
-            order = Orders.objects.get(razorpay_order_id=razorpay_order_id)
-            order.paymentstatus = "Paid"
-            order.amountpaid = order.amount
-            order.save()
-
-            OrderUpdate.objects.create(
-                order_id=order.order_id,
-                update_desc="Payment successful"
-            )
+            # Local HMAC check; no gateway round trip.
+            if not get_gateway().verify_payment_signature(
+                razorpay_order_id, razorpay_payment_id, razorpay_signature
+            ):
+                raise ValueError("invalid payment signature")
+
+            if not Orders.objects.filter(razorpay_order_id=razorpay_order_id).exists():
+                raise Orders.DoesNotExist(razorpay_order_id)
+
+            # Goes through the same ledger as the webhook, applied right away
+            # so the profile page shows the payment; whichever of the two
+            # arrives second is a no-op.
+            event = paymentevents.event_from_browser(razorpay_order_id, razorpay_payment_id)
+            paymentevents.record(event)
+            paymentevents.process_pending(queryset=PaymentEvent.objects.filter(key=event.key))
 
             return redirect("profile")
 
@@ -314,6 +451,33 @@ def payment_success(request):
     return redirect("checkout")
 
 
+# ==============================
+# Payment Webhook
+# ==============================
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    """Razorpay webhook: verify, append to the ledger, answer at once.
+
+    Status changes are applied by the ``process_payment_events --loop``
+    worker, so the gateway never waits on order writes and redeliveries are
+    dropped at insert.
+    """
+    if not verify_webhook_signature(request.body, request.headers.get("X-Razorpay-Signature")):
+        return JsonResponse({"error": "invalid signature"}, status=400)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "invalid payload"}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "invalid payload"}, status=400)
+
+    paymentevents.record(
+        paymentevents.event_from_webhook(payload, request.headers.get("X-Razorpay-Event-Id", ""))
+    )
+    return JsonResponse({"status": "ok"})
+
+
 # ==============================
 # Profile
 # ==============================
@@ -323,29 +487,12 @@ def profile(request):
         messages.warning(request, "Login & Try Again")
         return redirect('/auth/login')
 
-    orders = Orders.objects.filter(email=request.user.email)
-
-    delivered_order_ids = set(
-        OrderUpdate.objects.filter(
-            order_id__in=orders.values_list('order_id', flat=True),
-            delivered=True
-        ).values_list('order_id', flat=True)
+    # Status, delivery dates and the products summary are stored on the
+    # order; timelines come from one prefetch, however many orders there are.
+    orders = list(
+        Orders.objects.filter(email=request.user.email)
+        .order_by("-order_id")
+        .prefetch_related(Prefetch("updates", queryset=OrderUpdate.objects.order_by("update_id")))
     )
-    cancelled_order_ids = set(
-        OrderUpdate.objects.filter(
-            order_id__in=orders.values_list('order_id', flat=True),
-            cancelled=True
-        ).values_list('order_id', flat=True)
-    )
-
-    for order in orders:
-        order.is_delivered = order.order_id in delivered_order_ids
-        order.is_cancelled = order.order_id in cancelled_order_ids
-        if order.is_cancelled:
-            order.paymentstatus_display = "Cancelled"
-        else:
-            order.paymentstatus_display = order.paymentstatus or "Pending"
-        base_date = order.created_at or timezone.now()
-        order.expected_delivery = base_date + timedelta(days=10)
 
     return render(request, "profile.html", {"items": orders})